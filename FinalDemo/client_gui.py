@@ -2,9 +2,15 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import socket, threading, json, datetime
+import os, sys
+
+# bounded log view lives in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from log_view import LogView
 
 HOST = '127.0.0.1'
 PORT = 5555
+LOG_LINES = 2000   # lines kept in the log box
 
 def safe_send(sock, obj):
     try:
@@ -24,6 +30,8 @@ class GameClient:
         self.opponent_var = tk.StringVar()
 
         self.sock = None
+        self.online = set()       # other players online, kept in sync from presence deltas
+        self.online_version = 0
 
         frame = ttk.Frame(root)
         frame.pack(padx=10, pady=10, fill=tk.X)
@@ -54,12 +62,10 @@ class GameClient:
 
         self.log_box = tk.Text(root, height=10, state="disabled")
         self.log_box.pack(fill=tk.BOTH, padx=10, pady=6, expand=True)
+        self.log_view = LogView(self.log_box, LOG_LINES)
 
     def log(self, text):
-        self.log_box.configure(state="normal")
-        self.log_box.insert(tk.END, text + "\n")
-        self.log_box.configure(state="disabled")
-        self.log_box.yview(tk.END)
+        self.log_view.append(text)
 
     def connect(self):
         name = self.name_var.get().strip()
@@ -92,14 +98,18 @@ class GameClient:
     def handle_message(self, msg):
         t = msg.get("type")
         if t == "online_list":
-            players = msg.get("players", [])
-            # remove self
-            name = self.name_var.get().strip()
-            players = [p for p in players if p != name]
-            self.players_listbox.delete(0, tk.END)
-            for p in players:
-                self.players_listbox.insert(tk.END, p)
-            self.log("Online list updated.")
+            # full snapshot (sent once on connect)
+            self.online = set(msg.get("players", []))
+            self.online_version = msg.get("version", 0)
+            self.show_online()
+        elif t == "presence":
+            # delta; anything not newer than what we have is already applied
+            if msg.get("version", 0) <= self.online_version:
+                return
+            self.online_version = msg["version"]
+            self.online.update(msg.get("joined", []))
+            self.online.difference_update(msg.get("left", []))
+            self.show_online()
         elif t == "challenge_request":
             frm = msg.get("from")
             ans = messagebox.askyesno("Challenge", f"{frm} challenged you. Accept?")
@@ -139,6 +149,15 @@ class GameClient:
         else:
             self.log(f"MSG: {msg}")
 
+    def show_online(self):
+        # remove self
+        name = self.name_var.get().strip()
+        self.players_listbox.delete(0, tk.END)
+        for p in sorted(self.online):
+            if p != name:
+                self.players_listbox.insert(tk.END, p)
+        self.log("Online list updated.")
+
     def select_opponent(self):
         sel = self.players_listbox.curselection()
         if not sel:
@@ -10,6 +10,8 @@ class Client:
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.sock.connect((HOST, PORT))
         self.sock.send(json.dumps({"name": self.name}).encode())
+        self.online = set()
+        self.online_version = 0
         threading.Thread(target=self.listen, daemon=True).start()
 
     def listen(self):
@@ -26,7 +28,16 @@ class Client:
     def handle(self, msg):
         t = msg.get("type")
         if t == "online_list":
-            print("Online:", msg.get("players"))
+            self.online = set(msg.get("players", []))
+            self.online_version = msg.get("version", 0)
+            print("Online:", sorted(self.online))
+        elif t == "presence":
+            if msg.get("version", 0) <= self.online_version:
+                return
+            self.online_version = msg["version"]
+            self.online.update(msg.get("joined", []))
+            self.online.difference_update(msg.get("left", []))
+            print("Online:", sorted(self.online))
         elif t == "challenge_request":
             frm = msg.get("from")
             print(f"{frm} challenged you. Type 'accept {frm}' or 'decline {frm}'")
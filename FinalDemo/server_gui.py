@@ -5,9 +5,19 @@ import threading
 import socket
 import json
 import traceback
+import os
+import sys
+
+# shared round rules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import rps_rules
+from log_view import LogView
 
 HOST = '127.0.0.1'
 PORT = 5555
+LOG_LINES = 5000   # lines kept in the log box
+PRESENCE_WINDOW = 0.2   # seconds; joins/leaves inside one window go out as a single update
+REFRESH_DELAY_MS = 100  # UI changes from network threads are redrawn at most this often
 
 def safe_send(conn, obj):
     try:
@@ -15,6 +25,84 @@ def safe_send(conn, obj):
     except Exception:
         pass
 
+def safe_broadcast(conns, obj):
+    # encode once, then write the same buffer to every connection
+    data = json.dumps(obj).encode()
+    for conn in conns:
+        try:
+            conn.sendall(data)
+        except Exception:
+            pass
+
+class PresenceService:
+    # Tracks who is online and pushes {"type": "presence", "version", "joined", "left"} deltas.
+    # Changes are batched for `window` seconds and only sent when the published set really changes;
+    # a newly joined client gets one full "online_list" snapshot tagged with the current version;
+    # deltas published while that snapshot is being sent are held back and follow it in order.
+    def __init__(self, get_conns, on_change=None, window=PRESENCE_WINDOW):
+        self.get_conns = get_conns   # -> connections to notify
+        self.on_change = on_change   # called after each published update
+        self.window = window
+        self.lock = threading.Lock()        # guards the sets below
+        self.send_lock = threading.Lock()   # keeps deltas in version order on the wire
+        self.online = set()
+        self.published = set()       # what clients have been told
+        self.changed = set()         # names touched since the last update
+        self.version = 0
+        self.timer = None
+        self.pending = {}            # conn -> deltas held back until its snapshot is out
+
+    def join(self, name, conn):
+        with self.lock:
+            self.online.add(name)
+            self._touch(name)
+            snapshot = {"type": "online_list", "players": sorted(self.published), "version": self.version}
+            self.pending[conn] = []
+        # blocking sends happen without send_lock, so a slow client never stalls other joins or flushes
+        safe_send(conn, snapshot)
+        while True:
+            with self.lock:
+                held = self.pending[conn]
+                if not held:
+                    del self.pending[conn]
+                    return
+                self.pending[conn] = []
+            for delta in held:
+                safe_send(conn, delta)
+
+    def leave(self, name):
+        with self.lock:
+            self.online.discard(name)
+            self._touch(name)
+
+    def _touch(self, name):
+        self.changed.add(name)
+        if self.timer is None:
+            self.timer = threading.Timer(self.window, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        conns = self.get_conns()
+        with self.send_lock:
+            with self.lock:
+                self.timer = None
+                joined = sorted(n for n in self.changed if n in self.online and n not in self.published)
+                left = sorted(n for n in self.changed if n not in self.online and n in self.published)
+                self.changed.clear()
+                if not joined and not left:
+                    return
+                self.published.update(joined)
+                self.published.difference_update(left)
+                self.version += 1
+                delta = {"type": "presence", "version": self.version, "joined": joined, "left": left}
+                for held in self.pending.values():
+                    held.append(delta)
+                conns = [c for c in conns if c not in self.pending]
+            safe_broadcast(conns, delta)
+        if self.on_change:
+            self.on_change()
+
 class ServerGUI:
     def __init__(self, master):
         self.master = master
@@ -33,9 +121,17 @@ class ServerGUI:
         self.match_list = tk.Listbox(master, height=6)
         self.match_list.pack(fill=tk.X, padx=10, pady=5)
 
-        ttk.Label(master, text="📜 Server Log:").pack(anchor="w", padx=10)
+        frame_log = ttk.Frame(master)
+        frame_log.pack(fill=tk.X, padx=10)
+        ttk.Label(frame_log, text="📜 Server Log:").pack(side=tk.LEFT)
+        self.log_filter = tk.StringVar()
+        ttk.Entry(frame_log, textvariable=self.log_filter, width=24).pack(side=tk.RIGHT)
+        ttk.Label(frame_log, text="Filter:").pack(side=tk.RIGHT, padx=4)
         self.log_box = scrolledtext.ScrolledText(master, height=12, state="disabled")
         self.log_box.pack(fill=tk.BOTH, padx=10, pady=5, expand=True)
+        # bounded log: recent lines live in a ring buffer, the widget is trimmed in bulk
+        self.log_view = LogView(self.log_box, LOG_LINES)
+        self.log_filter.trace_add("write", lambda *args: self.log_view.set_filter(self.log_filter.get()))
 
         # Data
         self.lock = threading.Lock()
@@ -44,32 +140,52 @@ class ServerGUI:
         # games: key = tuple(sorted([p1,p2])) -> value dict {players:[p1,p2], score:{p1:0,p2:0}, round:1, moves:{}}
         self.games = {}
         self.matches_history = {}  # pair_str -> result
+        self.refresh_lock = threading.Lock()
+        self.refresh_pending = False
+        self.presence = PresenceService(self.client_conns, self.schedule_refresh)
+        self.master.after(REFRESH_DELAY_MS, self.poll_refresh)
 
         # Start server thread
         threading.Thread(target=self.start_server, daemon=True).start()
 
     def log(self, message):
-        self.log_box.configure(state="normal")
-        self.log_box.insert(tk.END, message + "\n")
-        self.log_box.configure(state="disabled")
-        self.log_box.yview(tk.END)
+        self.log_view.append(message)
+
+    def schedule_refresh(self):
+        # called from network threads: only raise a flag, no Tk calls off the Tk thread
+        with self.refresh_lock:
+            self.refresh_pending = True
+
+    def poll_refresh(self):
+        # Tk-side loop: at most one redraw per REFRESH_DELAY_MS however many updates came in
+        with self.refresh_lock:
+            pending = self.refresh_pending
+            self.refresh_pending = False
+        if pending:
+            self.refresh_ui()
+        self.master.after(REFRESH_DELAY_MS, self.poll_refresh)
 
     def refresh_ui(self):
+        # snapshot first (list() copies in one step); network threads keep changing clients/games.
+        # No self.lock here: network threads make Tk calls while holding it.
+        names = sorted(list(self.clients))
+        rows = []
+        for pair, info in list(self.games.items()):
+            p1, p2 = pair
+            score = info["score"]
+            rows.append(f"{p1} vs {p2} — {score[p1]}-{score[p2]} (R{info['round']})")
+
         self.online_list.delete(0, tk.END)
-        for name in sorted(self.clients.keys()):
+        for name in names:
             self.online_list.insert(tk.END, name)
 
         self.match_list.delete(0, tk.END)
-        for pair, info in self.games.items():
-            p1, p2 = pair
-            score = info["score"]
-            self.match_list.insert(tk.END, f"{p1} vs {p2} — {score[p1]}-{score[p2]} (R{info['round']})")
+        for row in rows:
+            self.match_list.insert(tk.END, row)
 
-    def broadcast_online(self):
+    def client_conns(self):
         with self.lock:
-            players = list(self.clients.keys())
-            for conn in self.clients.values():
-                safe_send(conn, {"type": "online_list", "players": players})
+            return list(self.clients.values())
 
     def start_server(self):
         server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -107,8 +223,7 @@ class ServerGUI:
 
             self.log(f"✅ {name} connected from {addr}")
             self.broadcast_system(f"{name} has joined.")
-            self.broadcast_online()
-            self.refresh_ui()
+            self.presence.join(name, conn)
 
             # Listen loop
             while True:
@@ -122,17 +237,18 @@ class ServerGUI:
         finally:
             # cleanup
             with self.lock:
-                if name and name in self.clients:
+                # a rejected duplicate name must not remove the player who owns it
+                registered = bool(name) and self.clients.get(name) is conn
+                if registered:
                     del self.clients[name]
                 if conn in self.addr_map:
                     del self.addr_map[conn]
             self.log(f"🚪 {name or addr} disconnected")
             self.broadcast_system(f"{name} has left.")
             # if player was in a game -> opponent wins
-            if name:
+            if registered:
                 self.handle_disconnect_in_games(name)
-            self.broadcast_online()
-            self.refresh_ui()
+                self.presence.leave(name)
             try:
                 conn.close()
             except:
@@ -140,8 +256,8 @@ class ServerGUI:
 
     def broadcast_system(self, text):
         with self.lock:
-            for conn in self.clients.values():
-                safe_send(conn, {"type": "system", "message": text})
+            conns = list(self.clients.values())
+        safe_broadcast(conns, {"type": "system", "message": text})
 
     def process_message(self, name, msg):
         t = msg.get("type")
@@ -181,7 +297,7 @@ class ServerGUI:
                 safe_send(self.clients[name], {"type": "challenge_start", "opponent": opponent})
                 safe_send(self.clients[opponent], {"type": "challenge_start", "opponent": name})
                 self.log(f"Match started: {pair[0]} vs {pair[1]}")
-                self.refresh_ui()
+                self.schedule_refresh()
             else:
                 # notify challenger that it's declined
                 if opponent in self.clients:
@@ -257,35 +373,19 @@ class ServerGUI:
 
                         # remove game
                         del self.games[pair]
-                        self.refresh_ui()
                         # broadcast matches changed (optional)
                     else:
                         # continue to next round
                         game["round"] += 1
                         game["moves"] = {}
+                    # score / round shown in the match list changed
+                    self.schedule_refresh()
         else:
             self.log(f"Unknown message type from {name}: {msg}")
 
-        # update online list to all clients whenever there's activity (safe)
-        self.broadcast_online()
-        self.refresh_ui()
-
     def judge(self, a, b):
-        # returns 0 draw, 1 winner is a, 2 winner is b
-        a = a.lower() if a else ""
-        b = b.lower() if b else ""
-        if a == b:
-            return 0
-        wins = {
-            "rock": "scissors",
-            "scissors": "paper",
-            "paper": "rock"
-        }
-        if wins.get(a) == b:
-            return 1
-        if wins.get(b) == a:
-            return 2
-        return 0
+        # returns 0 draw, 1 winner is a, 2 winner is b (precomputed table in rps_rules)
+        return rps_rules.judge(a, b)
 
     def handle_disconnect_in_games(self, name):
         # if name is in any active game, award win to opponent
@@ -302,7 +402,7 @@ class ServerGUI:
             for pair in to_remove:
                 if pair in self.games:
                     del self.games[pair]
-        self.refresh_ui()
+        self.schedule_refresh()
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -1,6 +1,11 @@
 # server_main.py
 # Simple console server version with same logic (useful for quick tests)
 import socket, threading, json, traceback
+import os, sys
+
+# shared round rules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import rps_rules
 
 HOST = '127.0.0.1'
 PORT = 5555
@@ -16,13 +21,8 @@ def safe_send(conn, obj):
         pass
 
 def judge(a,b):
-    a = a.lower() if a else ""
-    b = b.lower() if b else ""
-    if a == b: return 0
-    wins = {"rock":"scissors","scissors":"paper","paper":"rock"}
-    if wins.get(a) == b: return 1
-    if wins.get(b) == a: return 2
-    return 0
+    # 0 draw, 1 a wins, 2 b wins (precomputed table in rps_rules)
+    return rps_rules.judge(a, b)
 
 def handle_disconnect(name):
     with lock:
@@ -0,0 +1,124 @@
+"""
+binproto.py
+Chức năng: Giao thức nhị phân gọn (tùy chọn) thay cho JSON theo dòng.
+Client yêu cầu bằng trường 'proto': 'bin' trong action 'register'; ngay sau frame register đó,
+cả hai chiều chuyển sang frame nhị phân:
+
+    [độ dài payload: uint16][opcode: uint8][thân]
+
+- OP_MOVE / OP_ROUND_RESULT / OP_MATCH_END: message nóng, đóng gói bằng struct,
+  match_id (handle số nguyên của server) là uint32, nước đi là mã 1 byte.
+- OP_JSON: mọi message khác, thân là JSON.
+"""
+
+import json
+import struct
+
+from rps_rules import MOVES, MOVE_CODES
+
+OP_JSON = 0
+OP_MOVE = 1
+OP_ROUND_RESULT = 2
+OP_MATCH_END = 3
+
+HEADER = struct.Struct('!H')
+MOVE = struct.Struct('!BIB')              # opcode, handle, move
+ROUND_RESULT = struct.Struct('!BIBBB')    # opcode, handle, you, điểm p1, điểm p2
+MATCH_END = struct.Struct('!BIBBBB')      # opcode, handle, result, reason, điểm p1, điểm p2
+MAX_PAYLOAD = 0xFFFF
+NO_SCORE = 0xFF
+
+OUTCOMES = ('draw', 'win', 'lose')
+OUTCOME_CODES = {o: i for i, o in enumerate(OUTCOMES)}
+REASONS = (None, 'opponent_left', 'timeout')
+REASON_CODES = {r: i for i, r in enumerate(REASONS)}
+
+ROUND_RESULT_KEYS = {'type', 'you', 'score', 'match_id'}
+MATCH_END_KEYS = {'type', 'result', 'reason', 'score', 'match_id'}
+
+def _frame(payload):
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f'message quá lớn cho frame nhị phân ({len(payload)} byte)')
+    return HEADER.pack(len(payload)) + payload
+
+def _parse_score(score):
+    try:
+        a, b = score.split('-')
+        return int(a), int(b)
+    except Exception:
+        return NO_SCORE, NO_SCORE
+
+def _format_score(a, b):
+    return None if a == NO_SCORE else f'{a}-{b}'
+
+# --- MÃ HÓA ---
+def encode_message(obj):
+    """Mã hóa một message (dict) thành frame nhị phân.
+    Message nóng chỉ được đóng gói struct khi match_id là số nguyên, ngược lại gửi dạng OP_JSON."""
+    h = obj.get('match_id')
+    t = obj.get('type')
+    try:
+        if isinstance(h, int):
+            if obj.get('action') == 'move' and obj.get('move') in MOVE_CODES:
+                return _frame(MOVE.pack(OP_MOVE, h, MOVE_CODES[obj['move']]))
+            if t == 'round_result' and obj.get('you') in OUTCOME_CODES and obj.keys() <= ROUND_RESULT_KEYS:
+                return _frame(ROUND_RESULT.pack(OP_ROUND_RESULT, h, OUTCOME_CODES[obj['you']],
+                                                *_parse_score(obj.get('score', ''))))
+            if t == 'match_end' and obj.get('result') in OUTCOME_CODES and obj.get('reason') in REASON_CODES \
+                    and obj.keys() <= MATCH_END_KEYS:
+                return _frame(MATCH_END.pack(OP_MATCH_END, h, OUTCOME_CODES[obj['result']],
+                                             REASON_CODES[obj.get('reason')], *_parse_score(obj.get('score', ''))))
+    except struct.error:
+        pass
+    return _frame(bytes([OP_JSON]) + json.dumps(obj).encode('utf-8'))
+
+# --- GIẢI MÃ ---
+def decode_message(payload, player=None):
+    """Giải mã payload của một frame (không gồm header độ dài) thành dict.
+    player: tên người gửi (phía server) để điền vào message 'move'."""
+    op = payload[0]
+    if op == OP_JSON:
+        return json.loads(bytes(payload[1:]))
+    if op == OP_MOVE:
+        _, h, mv = MOVE.unpack(payload)
+        return {'action': 'move', 'player': player, 'move': MOVES[mv], 'match_id': h}
+    if op == OP_ROUND_RESULT:
+        _, h, you, a, b = ROUND_RESULT.unpack(payload)
+        return {'type': 'round_result', 'you': OUTCOMES[you], 'score': _format_score(a, b), 'match_id': h}
+    if op == OP_MATCH_END:
+        _, h, result, reason, a, b = MATCH_END.unpack(payload)
+        msg = {'type': 'match_end', 'result': OUTCOMES[result], 'match_id': h}
+        if REASONS[reason]:
+            msg['reason'] = REASONS[reason]
+        if a != NO_SCORE:
+            msg['score'] = _format_score(a, b)
+        return msg
+    raise ValueError(f'opcode không hợp lệ: {op}')
+
+# --- BỘ ĐỌC PHÍA CLIENT ---
+class BinaryReader:
+    """Bộ đọc frame nhị phân có trạng thái (cùng giao diện read_messages với json_helper.FramedReader)."""
+    def __init__(self, sock, bufsize=65536, leftover=b''):
+        self.sock = sock
+        self.buffer = bytearray(leftover)
+        self.recv_buf = bytearray(bufsize)
+        self.recv_view = memoryview(self.recv_buf)
+
+    def read_messages(self):
+        n = self.sock.recv_into(self.recv_buf)
+        if not n:
+            return None
+        self.buffer += self.recv_view[:n]
+        msgs = []
+        pos = 0
+        buf = self.buffer
+        while len(buf) - pos >= HEADER.size:
+            (size,) = HEADER.unpack_from(buf, pos)
+            end = pos + HEADER.size + size
+            if end > len(buf):
+                break
+            msgs.append(decode_message(bytes(buf[pos + HEADER.size:end])))
+            pos = end
+        if pos:
+            del buf[:pos]
+        return msgs
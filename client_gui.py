@@ -2,15 +2,22 @@
 import socket
 import threading
 import queue
+import json
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-from json_helper import send_json, recv_json
+from json_helper import FramedReader
+from log_view import LogView
+import binproto
 import time
 import os
 from datetime import datetime
 
 SERVER_HOST = "127.0.0.1"
 SERVER_PORT = 9999
+# Giao thức sau khi đăng ký: 'json' (mặc định) hoặc 'bin' (nhị phân gọn, xem binproto.py)
+PROTO = 'json'
+# Số dòng giữ lại trong khung log
+LOG_VIEW_LINES = 2000
 
 # ---------------------------
 # Helper: lưu lịch sử trận đấu
@@ -37,12 +44,16 @@ class RPSGuiClient:
         self.running = False
         self.gui_queue = gui_queue
         self.recv_thread = None
-        self.recv_buffer = b''
+        self.reader = None
+        self.proto = 'json'
 
-    def connect(self, host, port):
+    def connect(self, host, port, proto=PROTO):
         try:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.sock.connect((host, port))
+            # server chỉ trả lời sau frame register, nên chọn bộ đọc theo giao thức ngay từ đầu
+            self.proto = proto
+            self.reader = binproto.BinaryReader(self.sock) if proto == 'bin' else FramedReader(self.sock)
             self.running = True
             self.recv_thread = threading.Thread(target=self.receive_loop, daemon=True)
             self.recv_thread.start()
@@ -57,7 +68,7 @@ class RPSGuiClient:
                 try:
                     # If in match, inform quit
                     if self.name:
-                        send_json(self.sock, {'action': 'quit', 'player': self.name})
+                        self.sock.sendall(self.encode({'action': 'quit', 'player': self.name}))
                 except:
                     pass
                 self.sock.close()
@@ -65,9 +76,19 @@ class RPSGuiClient:
             pass
         self.running = False
 
+    def encode(self, obj):
+        # frame register luôn là JSON; giao thức nhị phân bắt đầu ngay sau frame này
+        if obj.get('action') == 'register':
+            if self.proto == 'bin':
+                obj = dict(obj, proto='bin')
+            return (json.dumps(obj) + '\n').encode('utf-8')
+        if self.proto == 'bin':
+            return binproto.encode_message(obj)
+        return (json.dumps(obj) + '\n').encode('utf-8')
+
     def send(self, obj):
         try:
-            send_json(self.sock, obj)
+            self.sock.sendall(self.encode(obj))
         except Exception as e:
             self.gui_queue.put(('error', f'Lỗi gửi dữ liệu: {e}'))
 
@@ -75,13 +96,18 @@ class RPSGuiClient:
         """Luồng nhận dữ liệu: đọc JSON terminated bằng newline"""
         try:
             while self.running:
-                msg = recv_json(self.sock)
-                if not msg:
+                msgs = self.reader.read_messages()
+                if msgs is None:
                     self.gui_queue.put(('disconnected', None))
                     self.running = False
                     break
-                # đẩy message về GUI để xử lý
-                self.gui_queue.put(('msg', msg))
+                # đẩy mọi message nhận được trong lần recv này về GUI để xử lý
+                for msg in msgs:
+                    if msg.get('type') == 'ping':
+                        # trả lời heartbeat ngay trên luồng nhận, không cần qua GUI
+                        self.send({'action': 'pong'})
+                        continue
+                    self.gui_queue.put(('msg', msg))
         except Exception as e:
             self.gui_queue.put(('error', f'Lỗi nhận dữ liệu: {e}'))
             self.running = False
@@ -179,6 +205,7 @@ class RPSApp(tk.Tk):
         self.txt_log = tk.Text(frm_game, height=12, width=62, bg='#0b0b0c', fg='#dcdcdc', bd=0)
 
         self.txt_log.place(x=8, y=88)
+        self.log_view = LogView(self.txt_log, LOG_VIEW_LINES)
 
         # Close handler
         self.protocol("WM_DELETE_WINDOW", self.on_close)
@@ -251,8 +278,7 @@ class RPSApp(tk.Tk):
 
     def append_log(self, text):
         ts = datetime.now().strftime('%H:%M:%S')
-        self.txt_log.insert('end', f'[{ts}] {text}\n')
-        self.txt_log.see('end')
+        self.log_view.append(f'[{ts}] {text}')
 
     # ---------------------------
     # Process messages from socket thread
@@ -304,7 +330,7 @@ class RPSApp(tk.Tk):
                 mid = msg.get('match_id') or msg.get('id')
                 self.client.match_id = mid
                 self.client.opponent = opp
-                self.set_status(f"Đang chơi với {opp} (match {mid})")
+                self.set_status(f"Đang chơi với {opp} (match {msg.get('match_name') or mid})")
                 self.append_log(f"Trận bắt đầu với {opp}")
                 # enable move buttons
                 self.set_move_buttons(True)
@@ -382,15 +408,22 @@ if __name__ == "__main__":
 import socket
 import threading
 import queue
+import json
 import tkinter as tk
 from tkinter import ttk, messagebox
-from json_helper import send_json, recv_json
+from json_helper import FramedReader
+from log_view import LogView
+import binproto
 import time
 import os
 from datetime import datetime
 
 SERVER_HOST = "127.0.0.1"
 SERVER_PORT = 9999
+# Giao thức sau khi đăng ký: 'json' (mặc định) hoặc 'bin' (nhị phân gọn, xem binproto.py)
+PROTO = 'json'
+# Số dòng giữ lại trong khung log
+LOG_VIEW_LINES = 2000
 
 # ---------------------------
 # Helper: lưu / đọc / xóa lịch sử trận đấu
@@ -443,11 +476,16 @@ class RPSGuiClient:
         self.running = False
         self.gui_queue = gui_queue
         self.recv_thread = None
+        self.reader = None
+        self.proto = 'json'
 
-    def connect(self, host, port):
+    def connect(self, host, port, proto=PROTO):
         try:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.sock.connect((host, port))
+            # server chỉ trả lời sau frame register, nên chọn bộ đọc theo giao thức ngay từ đầu
+            self.proto = proto
+            self.reader = binproto.BinaryReader(self.sock) if proto == 'bin' else FramedReader(self.sock)
             self.running = True
             self.recv_thread = threading.Thread(target=self.receive_loop, daemon=True)
             self.recv_thread.start()
@@ -461,7 +499,7 @@ class RPSGuiClient:
             if self.sock:
                 try:
                     if self.name:
-                        send_json(self.sock, {'action': 'quit', 'player': self.name})
+                        self.sock.sendall(self.encode({'action': 'quit', 'player': self.name}))
                 except:
                     pass
                 self.sock.close()
@@ -469,21 +507,35 @@ class RPSGuiClient:
             pass
         self.running = False
 
+    def encode(self, obj):
+        # frame register luôn là JSON; giao thức nhị phân bắt đầu ngay sau frame này
+        if obj.get('action') == 'register':
+            if self.proto == 'bin':
+                obj = dict(obj, proto='bin')
+            return (json.dumps(obj) + '\n').encode('utf-8')
+        if self.proto == 'bin':
+            return binproto.encode_message(obj)
+        return (json.dumps(obj) + '\n').encode('utf-8')
+
     def send(self, obj):
         try:
-            send_json(self.sock, obj)
+            self.sock.sendall(self.encode(obj))
         except Exception as e:
             self.gui_queue.put(('error', f'Lỗi gửi dữ liệu: {e}'))
 
     def receive_loop(self):
         try:
             while self.running:
-                msg = recv_json(self.sock)
-                if not msg:
+                msgs = self.reader.read_messages()
+                if msgs is None:
                     self.gui_queue.put(('disconnected', None))
                     self.running = False
                     break
-                self.gui_queue.put(('msg', msg))
+                for msg in msgs:
+                    if msg.get('type') == 'ping':
+                        self.send({'action': 'pong'})
+                        continue
+                    self.gui_queue.put(('msg', msg))
         except Exception as e:
             self.gui_queue.put(('error', f'Lỗi nhận dữ liệu: {e}'))
             self.running = False
@@ -583,6 +635,7 @@ class RPSApp(tk.Tk):
         ttk.Label(frm_game, text="Log:").place(x=8, y=80)
         self.txt_log = tk.Text(frm_game, height=14, width=62, bg='#0b0b0c', fg='#dcdcdc', bd=0)
         self.txt_log.place(x=8, y=100)
+        self.log_view = LogView(self.txt_log, LOG_VIEW_LINES)
 
         # Close handler
         self.protocol("WM_DELETE_WINDOW", self.on_close)
@@ -654,8 +707,7 @@ class RPSApp(tk.Tk):
 
     def append_log(self, text):
         ts = datetime.now().strftime('%H:%M:%S')
-        self.txt_log.insert('end', f'[{ts}] {text}\n')
-        self.txt_log.see('end')
+        self.log_view.append(f'[{ts}] {text}')
 
     # ---------------------------
     # History UI
@@ -752,7 +804,7 @@ class RPSApp(tk.Tk):
                 mid = msg.get('match_id') or msg.get('id')
                 self.client.match_id = mid
                 self.client.opponent = opp
-                self.set_status(f"In match vs {opp} (match {mid})")
+                self.set_status(f"In match vs {opp} (match {msg.get('match_name') or mid})")
                 self.append_log(f"Match started with {opp}")
                 # enable move buttons
                 self.set_move_buttons(True)
@@ -1,6 +1,6 @@
 import socket
 import threading
-from json_helper import send_json, recv_json
+from json_helper import send_json, FramedReader
 from history import save_history
 
 SERVER_HOST = "127.0.0.1"
@@ -13,6 +13,7 @@ class RPSClient:
         self.opponent = None
         self.running = True
         self.in_match = False
+        self.reader = FramedReader(self.sock)
 
     def connect(self):
         try:
@@ -27,7 +28,7 @@ class RPSClient:
 
     def receive_loop(self):
         while self.running:
-            msg = recv_json(self.sock)
+            msg = self.reader.recv_json()
             if not msg:
                 print("❌ Server disconnected.")
                 self.running = False
@@ -0,0 +1,95 @@
+"""
+framing.py
+Chức năng: Bộ tách frame theo dòng ('\\n') làm việc trực tiếp trên byte, dùng chung cho server.
+- Nhận dữ liệu bằng recv_into vào buffer cấp phát sẵn (không tạo bytes mới mỗi lần recv); buffer này chỉ
+  được cấp ở lần recv_from đầu tiên, nên đường asyncio (chỉ dùng feed) không tốn bộ nhớ cho nó.
+- Tách frame trên byte rồi mới decode, nên ký tự UTF-8 nhiều byte bị cắt giữa hai lần recv vẫn đúng.
+- Giới hạn độ dài một frame: client không gửi newline sẽ không làm buffer phình mãi.
+"""
+
+BUFFER_SIZE = 4096
+MAX_FRAME_SIZE = 64 * 1024
+
+class FrameTooLarge(ValueError):
+    """Frame vượt quá max_frame; phần còn lại của frame đó sẽ bị bỏ qua đến newline kế tiếp."""
+
+class FrameDecoder:
+    binary = False
+
+    def __init__(self, max_frame=MAX_FRAME_SIZE, bufsize=BUFFER_SIZE, sep=b'\n'):
+        self.max_frame = max_frame
+        self.sep = sep
+        self.buf = bytearray()
+        self.bufsize = bufsize
+        self.recv_buf = None    # cấp lười ở recv_from
+        self.recv_view = None
+        self._scan = 0          # vị trí trong buf đã quét mà chưa thấy sep
+        self._discarding = False
+
+    def recv_from(self, sock):
+        """Đọc một lần từ socket vào buffer sẵn có. Trả về số byte đọc được (0 = đóng kết nối)."""
+        if self.recv_buf is None:
+            self.recv_buf = bytearray(self.bufsize)
+            self.recv_view = memoryview(self.recv_buf)
+        n = sock.recv_into(self.recv_buf)
+        if n:
+            self.buf += self.recv_view[:n]
+        return n
+
+    def feed(self, data):
+        self.buf += data
+
+    def frames(self):
+        """Sinh ra từng frame hoàn chỉnh (bytes, không gồm sep).
+        Ném FrameTooLarge khi gặp frame quá dài; gọi lại frames() để đọc tiếp phần sau."""
+        buf = self.buf
+        start = 0
+        try:
+            while True:
+                idx = buf.find(self.sep, max(start, self._scan))
+                if idx < 0:
+                    self._scan = len(buf)
+                    if len(buf) - start > self.max_frame and not self._discarding:
+                        # frame chưa kết thúc nhưng đã quá dài -> bỏ phần đã nhận
+                        self._discarding = True
+                        start = self._scan = len(buf)
+                        raise FrameTooLarge(f'frame vượt quá {self.max_frame} byte')
+                    if self._discarding:
+                        start = self._scan = len(buf)
+                    return
+                frame_start, start = start, idx + len(self.sep)
+                self._scan = start
+                if self._discarding:
+                    self._discarding = False
+                    continue
+                if idx - frame_start > self.max_frame:
+                    raise FrameTooLarge(f'frame vượt quá {self.max_frame} byte')
+                yield bytes(buf[frame_start:idx])
+        finally:
+            # cắt phần đã xử lý một lần duy nhất (tránh chi phí bậc hai)
+            if start:
+                del buf[:start]
+                self._scan -= start
+
+class LengthPrefixedDecoder(FrameDecoder):
+    """Tách frame dạng [độ dài uint16 big-endian][payload] (giao thức nhị phân, xem binproto)."""
+    binary = True
+
+    def frames(self):
+        buf = self.buf
+        pos = 0
+        try:
+            while len(buf) - pos >= 2:
+                size = (buf[pos] << 8) | buf[pos + 1]
+                if size > self.max_frame:
+                    # không thể đồng bộ lại trong luồng nhị phân -> bỏ toàn bộ dữ liệu hiện có
+                    pos = len(buf)
+                    raise FrameTooLarge(f'frame vượt quá {self.max_frame} byte')
+                end = pos + 2 + size
+                if end > len(buf):
+                    return
+                frame_start, pos = pos + 2, end
+                yield bytes(buf[frame_start:end])
+        finally:
+            if pos:
+                del buf[:pos]
@@ -0,0 +1,122 @@
+"""
+gui_channel.py
+Chức năng: Kênh sự kiện có giới hạn giữa lõi server và GUI (thay cho queue.Queue không giới hạn).
+- put() không bao giờ chặn luồng mạng: chỉ giữ khóa trong lúc cập nhật vài biến, không cần ai đọc.
+- Ảnh chụp trạng thái được gộp: 'players' chỉ giữ danh sách mới nhất, 'matches' giữ dòng mới nhất
+  của mỗi trận (khóa là phần tử đầu của dòng), nên GUI chậm chỉ bỏ lỡ các trạng thái trung gian.
+- Dòng log bị giới hạn tốc độ (log_rate dòng/giây, tối đa log_pending dòng chờ); dòng vượt ngưỡng bị bỏ
+  và được báo lại bằng một dòng '... bỏ qua N dòng log ...'.
+- get() / get_nowait() giữ giao diện của queue.Queue; drain() lấy nhiều sự kiện một lần.
+"""
+
+import time
+import queue
+import threading
+import collections
+
+LOG_RATE = 500          # dòng log/giây được chuyển cho GUI
+LOG_PENDING = 2000      # số dòng log tối đa đang chờ GUI đọc
+MAX_MATCH_ROWS = 20000  # số trận tối đa đang chờ cập nhật lên GUI
+MAX_EVENTS = 1000       # các loại sự kiện khác
+
+class GuiChannel:
+    def __init__(self, log_rate=LOG_RATE, log_pending=LOG_PENDING, max_rows=MAX_MATCH_ROWS, max_events=MAX_EVENTS):
+        self.log_rate = log_rate
+        self.log_pending = log_pending
+        self.max_rows = max_rows
+        self._cond = threading.Condition(threading.Lock())
+        self._logs = collections.deque()
+        self._tokens = float(log_rate)
+        self._refilled = time.monotonic()
+        self._dropped = 0           # dòng log bị bỏ từ lần đánh dấu trước
+        self.dropped_logs = 0       # tổng số dòng log bị bỏ
+        self._players = None
+        self._matches = collections.OrderedDict()   # khóa trận -> dòng mới nhất
+        self._events = collections.deque(maxlen=max_events)
+
+    # --- PHÍA SERVER ---
+    def put(self, item, block=False, timeout=None):
+        """Đưa sự kiện vào kênh; không bao giờ chặn (block/timeout chỉ để tương thích với queue.Queue)"""
+        kind = item[0]
+        with self._cond:
+            if kind == 'log':
+                self._put_log(item[1])
+            elif kind == 'players':
+                self._players = item[1]
+            elif kind == 'matches':
+                rows = self._matches
+                for row in item[1]:
+                    rows[row[0]] = row
+                    rows.move_to_end(row[0])
+                while len(rows) > self.max_rows:
+                    rows.popitem(last=False)
+            else:
+                self._events.append(item)
+            self._cond.notify()
+
+    put_nowait = put
+
+    def _put_log(self, line):
+        now = time.monotonic()
+        self._tokens = min(self.log_rate, self._tokens + (now - self._refilled) * self.log_rate)
+        self._refilled = now
+        if self._tokens < 1 or len(self._logs) >= self.log_pending:
+            self._dropped += 1
+            self.dropped_logs += 1
+            return
+        self._tokens -= 1
+        self._flush_marker()
+        self._logs.append(line)
+
+    def _flush_marker(self):
+        if self._dropped:
+            self._logs.append(f'... bỏ qua {self._dropped} dòng log ...')
+            self._dropped = 0
+
+    # --- PHÍA GUI ---
+    def _pending(self):
+        return bool(self._events or self._logs or self._dropped or self._players is not None or self._matches)
+
+    def _take(self):
+        """Lấy một sự kiện (gọi khi giữ khóa và đang có sự kiện chờ)"""
+        if self._events:
+            return self._events.popleft()
+        if not self._logs:
+            self._flush_marker()
+        if self._logs:
+            return ('log', self._logs.popleft())
+        if self._players is not None:
+            players = self._players
+            self._players = None
+            return ('players', players)
+        rows = list(self._matches.values())
+        self._matches.clear()
+        return ('matches', rows)
+
+    def get(self, block=True, timeout=None):
+        with self._cond:
+            if not block:
+                if not self._pending():
+                    raise queue.Empty
+            elif not self._cond.wait_for(self._pending, timeout):
+                raise queue.Empty
+            return self._take()
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def drain(self, limit=None):
+        """Lấy tối đa `limit` sự kiện đang chờ (không chặn). Các ảnh chụp chỉ xuất hiện một lần."""
+        out = []
+        with self._cond:
+            while self._pending() and (limit is None or len(out) < limit):
+                out.append(self._take())
+        return out
+
+    def qsize(self):
+        with self._cond:
+            return len(self._events) + len(self._logs) + (self._players is not None) + bool(self._matches)
+
+    def empty(self):
+        with self._cond:
+            return not self._pending()
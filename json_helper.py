@@ -1,4 +1,7 @@
 import json
+import collections
+
+RECV_BUFFER_SIZE = 65536
 
 def send_json(sock, data):
     """
@@ -22,3 +25,41 @@ def recv_json(sock):
         if b'\n' in buffer:
             msg, _, buffer = buffer.partition(b'\n')
             return json.loads(msg.decode('utf-8'))
+
+
+class FramedReader:
+    """
+    Bộ đọc JSON có trạng thái, gắn với một socket.
+    Giữ lại phần byte thừa giữa các lần recv, nên khi server gửi nhiều message
+    liền nhau trong cùng một gói TCP thì không message nào bị mất.
+    """
+    def __init__(self, sock, bufsize=RECV_BUFFER_SIZE):
+        self.sock = sock
+        self.buffer = bytearray()
+        self.recv_buf = bytearray(bufsize)
+        self.recv_view = memoryview(self.recv_buf)
+        self.pending = collections.deque()
+
+    def read_messages(self):
+        """
+        Đọc một lần từ socket, trả về list mọi message hoàn chỉnh nhận được
+        (có thể rỗng nếu mới nhận một phần message). Trả về None khi socket đóng.
+        """
+        n = self.sock.recv_into(self.recv_buf)
+        if not n:
+            return None
+        self.buffer += self.recv_view[:n]
+        if self.recv_buf.find(b'\n', 0, n) < 0:
+            return []
+        *lines, rest = self.buffer.split(b'\n')
+        self.buffer = bytearray(rest)
+        return [json.loads(line) for line in lines if line.strip()]
+
+    def recv_json(self):
+        """Trả về message kế tiếp (các message còn lại được giữ cho lần gọi sau)."""
+        while not self.pending:
+            msgs = self.read_messages()
+            if msgs is None:
+                return None
+            self.pending.extend(msgs)
+        return self.pending.popleft()
@@ -0,0 +1,90 @@
+"""
+log_view.py
+Chức năng: Khung log có giới hạn cho các widget Tk Text (server và client).
+- Giữ max_lines dòng gần nhất trong một bộ đệm vòng (deque) trong bộ nhớ.
+- Widget được phép dài hơn max_lines thêm trim_chunk dòng rồi mới bị cắt, và cắt một lần bằng một lệnh delete.
+- search() / set_filter() làm việc trên bộ đệm, không đọc lại nội dung widget.
+- Chỉ tự cuộn xuống cuối khi người dùng đang ở cuối khung log.
+"""
+
+import threading
+import collections
+
+MAX_LINES = 5000
+TRIM_CHUNK = 500
+
+class LogView:
+    def __init__(self, text, max_lines=MAX_LINES, trim_chunk=TRIM_CHUNK):
+        self.text = text
+        self.max_lines = max_lines
+        self.trim_chunk = trim_chunk
+        self.lines = collections.deque(maxlen=max_lines)
+        self.pattern = ''
+        self._shown = 0     # số dòng đang có trong widget
+        self._lock = threading.Lock()
+
+    def append(self, *lines):
+        """Thêm một hoặc nhiều dòng (một chuỗi có '\\n' được tách thành nhiều dòng)"""
+        new = []
+        for line in lines:
+            new.extend(line.split('\n'))
+        with self._lock:
+            self.lines.extend(new)
+            if self.pattern:
+                new = [l for l in new if self._match(l)]
+            if new:
+                self._insert(new)
+
+    def search(self, pattern, limit=None):
+        """Các dòng còn giữ chứa `pattern` (không phân biệt hoa thường), cũ trước mới sau"""
+        pattern = pattern.lower()
+        with self._lock:
+            found = [l for l in self.lines if pattern in l.lower()]
+        return found[-limit:] if limit else found
+
+    def set_filter(self, pattern):
+        """Chỉ hiện các dòng chứa `pattern`; chuỗi rỗng = hiện tất cả"""
+        with self._lock:
+            self.pattern = pattern.strip().lower()
+            lines = [l for l in self.lines if self._match(l)] if self.pattern else list(self.lines)
+            self._edit(lambda: self.text.delete('1.0', 'end'))
+            self._shown = 0
+            if lines:
+                self._insert(lines)
+
+    def clear(self):
+        with self._lock:
+            self.lines.clear()
+            self._edit(lambda: self.text.delete('1.0', 'end'))
+            self._shown = 0
+
+    # --- WIDGET (gọi khi giữ _lock) ---
+    def _match(self, line):
+        return self.pattern in line.lower()
+
+    def _edit(self, fn):
+        # widget ở trạng thái 'disabled' (chỉ đọc) phải mở tạm mới sửa được
+        text = self.text
+        disabled = str(text.cget('state')) == 'disabled'
+        if disabled:
+            text.configure(state='normal')
+        try:
+            fn()
+        finally:
+            if disabled:
+                text.configure(state='disabled')
+
+    def _insert(self, lines):
+        text = self.text
+        follow = text.yview()[1] >= 0.999
+
+        def edit():
+            text.insert('end', '\n'.join(lines) + '\n')
+            self._shown += len(lines)
+            if self._shown > self.max_lines + self.trim_chunk:
+                extra = self._shown - self.max_lines
+                text.delete('1.0', f'{extra + 1}.0')
+                self._shown -= extra
+        self._edit(edit)
+        if follow:
+            text.see('end')
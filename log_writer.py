@@ -0,0 +1,186 @@
+"""
+log_writer.py
+Chức năng: Ghi log bất đồng bộ theo lô cho server_log.
+- write() chỉ nối dòng vào bộ đệm trong bộ nhớ rồi trả về ngay, không mở file, không chờ đĩa.
+- Một luồng nền giữ file mở, ghi cả lô mỗi flush_interval giây hoặc ngay khi bộ đệm vượt batch_bytes.
+- Xoay vòng file theo kích thước (rotate_bytes) và/hoặc theo thời gian (rotate_interval):
+  server_log.txt -> server_log.txt.1 -> ... -> server_log.txt.<backups>.
+- close() ghi nốt phần còn lại và dừng luồng nền; write() sau đó sẽ tự khởi động lại.
+- Lô ghi lỗi bị bỏ và được đếm trong dropped_lines; lỗi đầu tiên được báo ra stderr, lô sau mở lại file.
+- AppendWriter: cùng cơ chế nhưng mỗi dòng kèm đường dẫn file riêng (lịch sử từng người chơi);
+  mỗi lô mở mỗi file một lần.
+"""
+
+import os
+import sys
+import time
+import atexit
+import threading
+
+FLUSH_INTERVAL = 0.2
+BATCH_BYTES = 64 * 1024
+ROTATE_BYTES = 10 * 1024 * 1024
+ROTATE_INTERVAL = 0     # giây, 0 = không xoay theo thời gian
+BACKUPS = 5
+
+class LogWriter:
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL, batch_bytes=BATCH_BYTES,
+                 rotate_bytes=ROTATE_BYTES, rotate_interval=ROTATE_INTERVAL, backups=BACKUPS):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_bytes = batch_bytes
+        self.rotate_bytes = rotate_bytes
+        self.rotate_interval = rotate_interval
+        self.backups = backups
+        self.dropped_lines = 0      # tổng số dòng log bị bỏ vì lỗi ghi file
+        self._reported = False      # đã báo lỗi ghi ra stderr chưa
+        self._reset()
+        atexit.register(self.close)
+
+    def _reset(self):
+        self._cond = threading.Condition(threading.Lock())   # bảo vệ bộ đệm
+        self._io_lock = threading.Lock()                      # bảo vệ file
+        self._pending = []
+        self._pending_bytes = 0
+        self._thread = None
+        self._closing = False
+        self._file = None
+        self._opened_at = 0
+        self._pid = os.getpid()
+
+    def write(self, line):
+        """Xếp một dòng (đã có '\\n') vào bộ đệm; không chặn vì I/O"""
+        self._enqueue(line, len(line))
+
+    def _enqueue(self, item, size):
+        if self._pid != os.getpid():
+            # tiến trình con sau fork: luồng nền của tiến trình cha không tồn tại ở đây
+            self._reset()
+        with self._cond:
+            self._pending.append(item)
+            self._pending_bytes += size
+            if self._thread is None:
+                self._closing = False
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            if self._pending_bytes >= self.batch_bytes:
+                self._cond.notify()
+
+    def flush(self):
+        """Ghi ngay mọi dòng đang chờ (chạy trên luồng gọi)"""
+        self._write_out(self._take())
+
+    def close(self):
+        """Ghi nốt bộ đệm, đóng file và dừng luồng nền"""
+        with self._cond:
+            t = self._thread
+            self._closing = True
+            self._cond.notify()
+        if t is not None and t is not threading.current_thread() and self._pid == os.getpid():
+            t.join()
+        with self._cond:
+            self._thread = None
+            data = self._take_locked()
+        self._write_out(data)
+        with self._io_lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closing and self._pending_bytes < self.batch_bytes:
+                    self._cond.wait(self.flush_interval)
+                closing = self._closing
+                data = self._take_locked()
+            # ghi đĩa ngoài khóa bộ đệm: write() không bao giờ phải chờ I/O
+            self._write_out(data)
+            if closing:
+                return
+
+    def _take(self):
+        with self._cond:
+            return self._take_locked()
+
+    def _take_locked(self):
+        items = self._pending
+        self._pending = []
+        self._pending_bytes = 0
+        return items
+
+    def _report(self, path, e, lines):
+        self.dropped_lines += lines
+        if not self._reported:
+            self._reported = True
+            print(f'[log_writer] lỗi ghi {path}: {e!r} (bỏ các dòng log lỗi, xem dropped_lines)',
+                  file=sys.stderr)
+
+    # --- FILE (giữ _io_lock) ---
+    def _write_out(self, items):
+        if not items:
+            return
+        data = ''.join(items)
+        with self._io_lock:
+            try:
+                if self._file is None:
+                    self._open()
+                elif self._should_rotate():
+                    self._rotate()
+                self._file.write(data)
+                self._file.flush()
+            except Exception as e:
+                self._report(self.path, e, data.count('\n'))
+                # đóng file hỏng; lô sau sẽ thử mở lại
+                try:
+                    if self._file:
+                        self._file.close()
+                except Exception:
+                    pass
+                self._file = None
+
+    def _open(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._opened_at = time.time()
+
+    def _should_rotate(self):
+        if self.rotate_bytes and self._file.tell() >= self.rotate_bytes:
+            return True
+        return bool(self.rotate_interval) and time.time() - self._opened_at >= self.rotate_interval
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for i in range(self.backups - 1, 0, -1):
+            src = f'{self.path}.{i}'
+            if os.path.exists(src):
+                os.replace(src, f'{self.path}.{i + 1}')
+        if self.backups:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+        self._open()
+
+class AppendWriter(LogWriter):
+    """Ghi nối thêm theo lô vào nhiều file: write(path, line). Không xoay vòng, không giữ file mở."""
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, batch_bytes=BATCH_BYTES):
+        super().__init__(None, flush_interval, batch_bytes, rotate_bytes=0)
+
+    def write(self, path, line):
+        """Xếp một dòng cho file `path` vào bộ đệm; không chặn vì I/O"""
+        self._enqueue((path, line), len(line))
+
+    def _write_out(self, items):
+        if not items:
+            return
+        by_path = {}    # giữ thứ tự dòng trong từng file
+        for path, line in items:
+            by_path.setdefault(path, []).append(line)
+        with self._io_lock:
+            for path, lines in by_path.items():
+                try:
+                    with open(path, 'a', encoding='utf-8') as f:
+                        f.write(''.join(lines))
+                except Exception as e:
+                    self._report(path, e, len(lines))
@@ -0,0 +1,56 @@
+"""
+match_archive.py
+Chức năng: Lưu trữ các trận đã kết thúc, tách khỏi bảng trận đang diễn ra.
+- Giữ tối đa max_entries trận gần nhất trong bộ nhớ (vòng đệm), bỏ trận quá max_age giây.
+- Tùy chọn ghi (spill) các trận bị đẩy ra khỏi bộ nhớ vào file JSON lines để tra cứu lâu dài.
+"""
+
+import json
+import time
+import threading
+from collections import OrderedDict
+
+ARCHIVE_SIZE = 10000
+ARCHIVE_MAX_AGE = 3600
+
+class MatchArchive:
+    def __init__(self, max_entries=ARCHIVE_SIZE, max_age=ARCHIVE_MAX_AGE, spill_path=None):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.spill_path = spill_path
+        self._lock = threading.Lock()
+        self._items = OrderedDict()  # match_id -> bản ghi, theo thứ tự kết thúc
+
+    def add(self, match_id, record):
+        """Lưu bản ghi (dict) của một trận vừa kết thúc"""
+        record = dict(record, match_id=match_id, finished_at=time.time())
+        with self._lock:
+            self._items[match_id] = record
+            evicted = self._trim(record['finished_at'])
+        if evicted and self.spill_path:
+            self._spill(evicted)
+
+    def get(self, match_id):
+        with self._lock:
+            return self._items.get(match_id)
+
+    def __contains__(self, match_id):
+        return match_id in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def _trim(self, now):
+        evicted = []
+        items = self._items
+        while items and (len(items) > self.max_entries or
+                         (self.max_age and now - next(iter(items.values()))['finished_at'] > self.max_age)):
+            evicted.append(items.popitem(last=False)[1])
+        return evicted
+
+    def _spill(self, records):
+        try:
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(r) + '\n' for r in records))
+        except Exception:
+            pass
@@ -0,0 +1,12 @@
+"""
+match_history.py
+Chức năng: Định dạng dòng lịch sử trận (file history_<player>.txt), dùng chung cho MatchServer và tournament.
+Không có tác dụng phụ khi import (không tạo thư mục, không mở file).
+"""
+
+from datetime import datetime
+
+def format_history(opponent, result, score_str, timestamp=None):
+    """Một dòng trong file history_<player>.txt"""
+    timestamp = timestamp or datetime.now().strftime('%Y-%m-%d %H:%M')
+    return f'[{timestamp}] vs {opponent} — {result} ({score_str})\n'
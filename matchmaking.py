@@ -0,0 +1,311 @@
+"""
+matchmaking.py
+Chức năng: Hàng chờ ghép trận tự động theo rating.
+- Người chơi chờ được giữ trong SortedBuckets (danh sách đã sắp xếp chia thành các bucket nhỏ):
+  thêm / xóa / tìm hàng xóm gần nhất đều ~O(log n), kể cả với hàng chục nghìn người đang chờ.
+- Độ lệch rating cho phép nới rộng theo thời gian chờ: tol = min(MAX_TOLERANCE, BASE_TOLERANCE + WIDEN_RATE * giây_chờ).
+  Hai người được ghép nếu chênh lệch <= tol của một trong hai người.
+- Không quét định kỳ cả hàng chờ: mỗi người có một timer (bánh xe hẹn giờ dùng chung) hẹn đúng lúc
+  tol của họ đủ phủ khoảng cách đến hàng xóm gần nhất; khi hàng xóm thay đổi thì hẹn lại.
+"""
+
+import time
+import threading
+from bisect import bisect_left, insort
+
+BASE_TOLERANCE = 50     # điểm rating
+WIDEN_RATE = 25         # điểm rating mỗi giây chờ
+MAX_TOLERANCE = 400
+BUCKET_LOAD = 512
+
+# --- DANH SÁCH ĐÃ SẮP XẾP CHIA BUCKET ---
+class SortedBuckets:
+    """Danh sách khóa đã sắp xếp, chia thành các bucket <= 2*load phần tử.
+    Tìm bucket bằng bisect trên phần tử lớn nhất của mỗi bucket, chèn/xóa chỉ dịch trong một bucket.
+    Cây Fenwick trên độ dài các bucket cho phép tra vị trí (hạng) và lấy phần tử thứ i trong O(log n);
+    cây chỉ dựng lại khi bucket bị tách hoặc xóa."""
+    def __init__(self, load=BUCKET_LOAD):
+        self.load = load
+        self._lists = []
+        self._maxes = []
+        self._len = 0
+        self._fen = None
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for lst in self._lists:
+            yield from lst
+
+    def add(self, key):
+        lists = self._lists
+        if not lists:
+            lists.append([key])
+            self._maxes.append(key)
+            self._fen = None
+        else:
+            i = bisect_left(self._maxes, key)
+            if i == len(lists):
+                i -= 1
+                lists[i].append(key)
+                self._maxes[i] = key
+            else:
+                insort(lists[i], key)
+            lst = lists[i]
+            if len(lst) > 2 * self.load:
+                half = lst[self.load:]
+                del lst[self.load:]
+                self._maxes[i] = lst[-1]
+                lists.insert(i + 1, half)
+                self._maxes.insert(i + 1, half[-1])
+                self._fen = None
+            else:
+                self._fen_add(i, 1)
+        self._len += 1
+
+    def _locate(self, key):
+        i = bisect_left(self._maxes, key)
+        if i < len(self._lists):
+            lst = self._lists[i]
+            j = bisect_left(lst, key)
+            if j < len(lst) and lst[j] == key:
+                return i, j
+        raise KeyError(key)
+
+    def remove(self, key):
+        i, j = self._locate(key)
+        lst = self._lists[i]
+        del lst[j]
+        if not lst:
+            del self._lists[i]
+            del self._maxes[i]
+            self._fen = None
+        else:
+            if j == len(lst):
+                self._maxes[i] = lst[-1]
+            self._fen_add(i, -1)
+        self._len -= 1
+
+    # --- CHỈ SỐ VỊ TRÍ (cây Fenwick trên độ dài bucket) ---
+    def _build_index(self):
+        n = len(self._lists)
+        fen = [0] * (n + 1)
+        for i, lst in enumerate(self._lists):
+            fen[i + 1] += len(lst)
+            j = (i + 1) + ((i + 1) & -(i + 1))
+            if j <= n:
+                fen[j] += fen[i + 1]
+        self._fen = fen
+
+    def _fen_add(self, i, delta):
+        fen = self._fen
+        if fen is None:
+            return
+        i += 1
+        while i < len(fen):
+            fen[i] += delta
+            i += i & -i
+
+    def bisect_left(self, key):
+        """Số khóa nhỏ hơn key"""
+        i = bisect_left(self._maxes, key)
+        if i == len(self._lists):
+            return self._len
+        if self._fen is None:
+            self._build_index()
+        pos = bisect_left(self._lists[i], key)
+        fen = self._fen
+        while i > 0:
+            pos += fen[i]
+            i -= i & -i
+        return pos
+
+    def _find(self, pos):
+        """(bucket, vị trí trong bucket) của phần tử thứ pos"""
+        if self._fen is None:
+            self._build_index()
+        fen = self._fen
+        i = 0
+        step = 1 << (len(fen) - 1).bit_length()
+        while step:
+            if i + step < len(fen) and fen[i + step] <= pos:
+                i += step
+                pos -= fen[i]
+            step >>= 1
+        return i, pos
+
+    def __getitem__(self, pos):
+        if pos < 0:
+            pos += self._len
+        if not 0 <= pos < self._len:
+            raise IndexError('vị trí ngoài danh sách')
+        i, j = self._find(pos)
+        return self._lists[i][j]
+
+    def islice(self, start, stop):
+        """Các khóa ở vị trí start..stop-1"""
+        start = max(start, 0)
+        stop = min(stop, self._len)
+        if start >= stop:
+            return
+        i, j = self._find(start)
+        n = stop - start
+        while n > 0:
+            lst = self._lists[i]
+            chunk = lst[j:j + n]
+            yield from chunk
+            n -= len(chunk)
+            i += 1
+            j = 0
+
+    def neighbours(self, key):
+        """(khóa liền trước, khóa liền sau) của key đang có trong danh sách, None nếu không có"""
+        i, j = self._locate(key)
+        lists = self._lists
+        lst = lists[i]
+        if j > 0:
+            prev = lst[j - 1]
+        else:
+            prev = lists[i - 1][-1] if i > 0 else None
+        if j + 1 < len(lst):
+            nxt = lst[j + 1]
+        else:
+            nxt = lists[i + 1][0] if i + 1 < len(lists) else None
+        return prev, nxt
+
+# --- HÀNG CHỜ GHÉP TRẬN ---
+class _Waiting:
+    __slots__ = ('name', 'rating', 'joined', 'key', 'timer')
+
+    def __init__(self, name, rating, joined, seq):
+        self.name = name
+        self.rating = rating
+        self.joined = joined
+        self.key = (rating, seq, name)
+        self.timer = None
+
+class MatchQueue:
+    """Hàng chờ theo rating. add()/remove() trả về ngay; cặp được ghép (ngay khi thêm hoặc khi
+    timer nới độ lệch đến hạn) được báo qua on_pair(p1, p2), gọi ngoài khóa của hàng chờ."""
+    def __init__(self, scheduler, on_pair, base=BASE_TOLERANCE, rate=WIDEN_RATE, max_tolerance=MAX_TOLERANCE):
+        self.scheduler = scheduler
+        self.on_pair = on_pair
+        self.base = base
+        self.rate = rate
+        self.max_tolerance = max_tolerance
+        self._lock = threading.Lock()
+        self._sorted = SortedBuckets()
+        self._waiting = {}  # name -> _Waiting
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._waiting)
+
+    def __contains__(self, name):
+        return name in self._waiting
+
+    def tolerance(self, w, now):
+        return min(self.max_tolerance, self.base + self.rate * (now - w.joined))
+
+    def add(self, name, rating):
+        """Thêm người chơi vào hàng chờ. Trả về False nếu đã có trong hàng chờ."""
+        now = time.monotonic()
+        with self._lock:
+            if name in self._waiting:
+                return False
+            self._seq += 1
+            w = _Waiting(name, rating, now, self._seq)
+            self._waiting[name] = w
+            self._sorted.add(w.key)
+            pair = self._try_pair(w, now)
+            if not pair:
+                self._arm(w, now)
+                # hàng xóm cũ giờ có người gần hơn -> hẹn kiểm tra sớm hơn
+                for k in self._sorted.neighbours(w.key):
+                    if k is not None:
+                        self._arm(self._waiting[k[2]], now)
+        if pair:
+            self.on_pair(*pair)
+        return True
+
+    def remove(self, name):
+        """Rời hàng chờ. Trả về False nếu người chơi không có trong hàng chờ."""
+        with self._lock:
+            w = self._waiting.pop(name, None)
+            if w is None:
+                return False
+            self._drop(w)
+        return True
+
+    def _drop(self, w):
+        if w.timer:
+            w.timer.cancel()
+            w.timer = None
+        self._sorted.remove(w.key)
+
+    def _candidates(self, w):
+        return [self._waiting[k[2]] for k in self._sorted.neighbours(w.key) if k is not None]
+
+    def _try_pair(self, w, now):
+        """Ghép w với hàng xóm gần nhất đủ điều kiện (gọi khi giữ _lock)"""
+        best = None
+        for other in self._candidates(w):
+            gap = abs(other.rating - w.rating)
+            if gap <= max(self.tolerance(w, now), self.tolerance(other, now)):
+                if best is None or gap < abs(best.rating - w.rating):
+                    best = other
+        if best is None:
+            return None
+        del self._waiting[w.name]
+        del self._waiting[best.name]
+        self._drop(w)
+        self._drop(best)
+        # người chờ lâu hơn làm p1
+        return (best.name, w.name) if best.joined <= w.joined else (w.name, best.name)
+
+    def _arm(self, w, now):
+        """Hẹn kiểm tra lại w khi tol của w đủ phủ khoảng cách đến hàng xóm gần nhất"""
+        if w.timer:
+            w.timer.cancel()
+            w.timer = None
+        gaps = [abs(o.rating - w.rating) for o in self._candidates(w)]
+        if not gaps or min(gaps) > self.max_tolerance:
+            return  # chờ có người mới vào gần hơn
+        delay = (min(gaps) - self.base) / self.rate - (now - w.joined)
+        w.timer = self.scheduler.schedule(max(delay, 0), self._recheck, w.name)
+
+    def _recheck(self, name):
+        now = time.monotonic()
+        with self._lock:
+            w = self._waiting.get(name)
+            if w is None:
+                return
+            w.timer = None
+            pair = self._try_pair(w, now)
+            if not pair:
+                self._arm(w, now)
+        if pair:
+            self.on_pair(*pair)
+
+if __name__ == '__main__':
+    # Đo độ trễ ghép cặp khi hàng chờ đã có sẵn nhiều người: python matchmaking.py [số_người_chờ]
+    import sys
+    import random
+    from timer_wheel import TimerWheel
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    paired = []
+    q = MatchQueue(TimerWheel(tick=0.1), lambda a, b: paired.append((a, b)), max_tolerance=0, base=0)
+    for i in range(n):
+        q.add(f'w{i}', random.random() * 3000 + i * 1e-9)
+    q.base = BASE_TOLERANCE
+    q.max_tolerance = MAX_TOLERANCE
+    lat = []
+    for i in range(20000):
+        t0 = time.perf_counter()
+        q.add(f'n{i}', random.uniform(0, 3000))
+        lat.append(time.perf_counter() - t0)
+    lat.sort()
+    print(f'{n} người đang chờ, {len(paired)} cặp ghép ngay')
+    print(f'độ trễ add(): trung vị {lat[len(lat) // 2] * 1e6:.1f} µs, p99 {lat[int(len(lat) * 0.99)] * 1e6:.1f} µs, max {lat[-1] * 1e6:.1f} µs')
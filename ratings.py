@@ -0,0 +1,152 @@
+"""
+ratings.py
+Chức năng: Rating Elo của người chơi, cập nhật từng trận khi trận kết thúc.
+- Chỉ mục thứ tự (SortedBuckets + cây Fenwick) theo rating giảm dần: top K, hạng của một người,
+  và những người có rating gần R đều dưới tuyến tính.
+- Lưu gọn dạng log nối thêm 'tên<TAB>rating<TAB>số_trận' (dòng sau ghi đè dòng trước),
+  được nén lại (lúc nạp và trong khi chạy) khi log dài gấp đôi số người chơi.
+  Dòng mới được ghi theo lô trên luồng nền (LogWriter), record() không chờ đĩa.
+  Trong cluster chỉ coordinator giữ file mở nên chỉ coordinator ghi và nén.
+- Bảng xếp hạng được cache theo phiên bản; phiên bản chỉ tăng khi có rating thay đổi.
+"""
+
+import os
+import threading
+
+from matchmaking import SortedBuckets
+from log_writer import LogWriter
+
+DEFAULT_RATING = 1500
+K_FACTOR = 32
+K_PROVISIONAL = 48          # hệ số K cho người mới (ít hơn PROVISIONAL_GAMES trận)
+PROVISIONAL_GAMES = 10
+LEADERBOARD_MAX = 100
+COMPACT_MIN_LINES = 1000    # không nén khi log còn ngắn hơn mức này (tránh nén liên tục khi ít người chơi)
+
+def expected_score(ra, rb):
+    return 1.0 / (1.0 + 10 ** ((rb - ra) / 400.0))
+
+class RatingTable:
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._players = {}      # name -> [rating, số trận]
+        self._index = SortedBuckets()   # khóa (-rating, name): thứ tự tăng = bảng xếp hạng
+        self._log = None        # LogWriter nối thêm vào file
+        self._lines = 0         # số dòng hiện có trong file log
+        self.version = 0
+        self._cache = {}        # k -> (version, danh sách)
+        if path:
+            self._load()
+
+    # --- LƯU / NẠP ---
+    def _load(self):
+        lines = 0
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t')
+                    if len(parts) != 3:
+                        continue
+                    self._players[parts[0]] = [float(parts[1]), int(parts[2])]
+                    lines += 1
+        for name, (rating, _) in self._players.items():
+            self._index.add((-rating, name))
+        self._lines = lines
+        if lines > 2 * len(self._players):
+            self._compact()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._log = LogWriter(self.path, rotate_bytes=0, backups=0)
+
+    def _compact(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for name, (rating, games) in self._players.items():
+                f.write(f'{name}\t{rating:.2f}\t{games}\n')
+        os.replace(tmp, self.path)
+        self._lines = len(self._players)
+
+    def _persist(self, names):
+        if self._log is None:
+            return
+        for name in names:
+            rating, games = self._players[name]
+            self._log.write(f'{name}\t{rating:.2f}\t{games}\n')
+        self._lines += len(names)
+        if self._lines > max(COMPACT_MIN_LINES, 2 * len(self._players)):
+            # nén trong khi chạy: ghi nốt và đóng file log, ghi file tạm rồi os.replace;
+            # lần write() sau LogWriter tự mở lại file mới để nối tiếp
+            self._log.close()
+            try:
+                self._compact()
+            except Exception:
+                pass
+
+    def close(self):
+        with self._lock:
+            if self._log:
+                self._log.close()
+                self._log = None
+
+    # --- CẬP NHẬT ---
+    def rating(self, name):
+        p = self._players.get(name)
+        return p[0] if p else DEFAULT_RATING
+
+    def _set(self, name, rating):
+        p = self._players.get(name)
+        if p is None:
+            p = self._players[name] = [DEFAULT_RATING, 0]
+        else:
+            self._index.remove((-p[0], name))
+        p[0] = rating
+        p[1] += 1
+        self._index.add((-rating, name))
+
+    def _k(self, name):
+        p = self._players.get(name)
+        return K_PROVISIONAL if not p or p[1] < PROVISIONAL_GAMES else K_FACTOR
+
+    def record(self, a, b, score_a):
+        """Cập nhật sau trận a vs b; score_a = 1 (a thắng), 0 (a thua), 0.5 (hòa). Trả về (rating a, rating b) mới."""
+        with self._lock:
+            ra = self.rating(a)
+            rb = self.rating(b)
+            new_a = ra + self._k(a) * (score_a - expected_score(ra, rb))
+            new_b = rb + self._k(b) * ((1 - score_a) - expected_score(rb, ra))
+            self._set(a, new_a)
+            self._set(b, new_b)
+            self.version += 1
+            self._persist((a, b))
+            return new_a, new_b
+
+    # --- TRA CỨU ---
+    def __len__(self):
+        return len(self._players)
+
+    def rank(self, name):
+        """(hạng bắt đầu từ 1, rating, số trận) hoặc None nếu chưa có rating"""
+        with self._lock:
+            p = self._players.get(name)
+            if p is None:
+                return None
+            return self._index.bisect_left((-p[0], name)) + 1, p[0], p[1]
+
+    def top(self, k):
+        """k người đứng đầu: [(hạng, tên, rating)]"""
+        k = max(0, min(k, LEADERBOARD_MAX))
+        with self._lock:
+            cached = self._cache.get(k)
+            if cached and cached[0] == self.version:
+                return cached[1]
+            rows = [(i, name, round(-neg)) for i, (neg, name) in enumerate(self._index.islice(0, k), 1)]
+            self._cache[k] = (self.version, rows)
+            return rows
+
+    def near(self, rating, k=10):
+        """Khoảng k người có rating gần `rating` nhất (quanh vị trí của nó trong bảng xếp hạng)"""
+        k = max(0, min(k, LEADERBOARD_MAX))
+        with self._lock:
+            pos = self._index.bisect_left((-rating, ''))
+            start = max(0, pos - k // 2)
+            return [(i, name, round(-neg)) for i, (neg, name) in enumerate(self._index.islice(start, start + k), start + 1)]
@@ -0,0 +1,84 @@
+"""
+rps_rules.py
+Chức năng: Luật Oẳn tù tì dùng chung cho server, FinalDemo và các công cụ mô phỏng.
+- Chiêu là mã nhỏ 0/1/2 (chỉ số trong MOVES); kết quả 0 = hòa, 1 = bên a thắng, 2 = bên b thắng.
+- Một round: tra bảng OUTCOME 3x3 tính sẵn, không dựng dict mỗi lần gọi.
+- Nhiều round: resolve_batch() giải hàng triệu round trong một lần gọi bằng NumPy;
+  không có NumPy thì dùng vòng lặp Python thuần (cùng kết quả, chậm hơn).
+"""
+
+import random
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:  # NumPy là tùy chọn
+    np = None
+
+MOVES = ('rock', 'paper', 'scissors')
+MOVE_CODES = {m: i for i, m in enumerate(MOVES)}
+
+DRAW = 0
+A_WINS = 1
+B_WINS = 2
+OUTCOMES = ('draw', 'a', 'b')
+
+# OUTCOME[a][b]: chiêu sau thắng chiêu trước trong MOVES (paper > rock, scissors > paper, rock > scissors)
+OUTCOME = tuple(tuple((a - b) % 3 for b in range(3)) for a in range(3))
+_OUTCOME_FLAT = tuple(OUTCOME[i // 3][i % 3] for i in range(9))
+_OUTCOME_NP = np.array(OUTCOME, dtype=np.int8) if np is not None else None
+
+def code_of(move):
+    """Mã của chiêu dạng chuỗi (không phân biệt hoa thường), None nếu không hợp lệ"""
+    code = MOVE_CODES.get(move)
+    if code is None and isinstance(move, str):
+        code = MOVE_CODES.get(move.lower())
+    return code
+
+def resolve(a, b):
+    """Kết quả một round với a, b là mã chiêu"""
+    return OUTCOME[a][b]
+
+def judge(a, b):
+    """Như resolve() nhưng nhận chiêu dạng chuỗi; chiêu thiếu hoặc không hợp lệ tính là hòa"""
+    ca = code_of(a)
+    cb = code_of(b)
+    if ca is None or cb is None:
+        return DRAW
+    return OUTCOME[ca][cb]
+
+# --- GIẢI NHIỀU ROUND MỘT LẦN ---
+def resolve_batch(moves_a, moves_b):
+    """Giải từng cặp (moves_a[i], moves_b[i]) là mã chiêu.
+    Có NumPy: trả về mảng int8; không có: trả về list int. Mã ngoài 0..2 gây IndexError."""
+    if np is not None:
+        a = np.asarray(moves_a, dtype=np.intp)
+        b = np.asarray(moves_b, dtype=np.intp)
+        if a.shape != b.shape:
+            raise ValueError('moves_a và moves_b phải cùng độ dài')
+        # chỉ số âm không gây lỗi trong NumPy (-1 -> scissors): kiểm tra như nhánh thuần Python
+        if ((a < 0) | (a > 2)).any() or ((b < 0) | (b > 2)).any():
+            raise IndexError('mã chiêu phải trong khoảng 0..2')
+        return _OUTCOME_NP[a, b]
+    if len(moves_a) != len(moves_b):
+        raise ValueError('moves_a và moves_b phải cùng độ dài')
+    flat = _OUTCOME_FLAT
+    for x in (moves_a, moves_b):
+        if any(c < 0 or c > 2 for c in x):
+            raise IndexError('mã chiêu phải trong khoảng 0..2')
+    return [flat[3 * a + b] for a, b in zip(moves_a, moves_b)]
+
+def tally(outcomes):
+    """Đếm (hòa, a thắng, b thắng) trong kết quả của resolve_batch()"""
+    if np is not None and isinstance(outcomes, np.ndarray):
+        counts = np.bincount(outcomes, minlength=3)
+        return int(counts[DRAW]), int(counts[A_WINS]), int(counts[B_WINS])
+    counts = Counter(outcomes)
+    return counts[DRAW], counts[A_WINS], counts[B_WINS]
+
+def random_moves(n, seed=None):
+    """n chiêu ngẫu nhiên (mã 0..2), cùng kiểu trả về với resolve_batch()"""
+    if np is not None:
+        return np.random.default_rng(seed).integers(0, 3, n, dtype=np.int8)
+    rng = random.Random(seed)
+    return [rng.randrange(3) for _ in range(n)]
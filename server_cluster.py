@@ -0,0 +1,427 @@
+"""
+server_cluster.py
+Chức năng: Chạy MatchServer trên nhiều tiến trình worker cùng lắng nghe một cổng (SO_REUSEPORT),
+kernel tự chia kết nối cho các worker. Tiến trình cha làm coordinator qua Unix socket:
+- giữ bảng người chơi -> worker và trận -> worker (mỗi trận chỉ sống trong đúng một worker);
+- chuyển tiếp message gửi đến người chơi ở worker khác;
+- chuyển tiếp 'move' đến worker sở hữu trận, và 'quit' đến mọi worker;
+- báo trận bắt đầu / kết thúc cho mọi worker, để `player_match` của từng worker biết cả người chơi
+  đang ở trong trận của worker khác (in_match, và kiểm tra already_in_match của accept / queue);
+- là nơi duy nhất giữ và ghi bảng rating (history/ratings.tsv): worker gửi kết quả trận và chuyển tiếp
+  'leaderboard' / 'rank' lên coordinator;
+- giữ hàng chờ ghép trận chung (MatchQueue) cho cả cluster: worker chuyển 'queue' / 'dequeue' lên,
+  cặp được ghép được giao cho worker của p1 mở trận (start_match).
+Trên mỗi worker, người chơi ở worker khác xuất hiện trong `clients` dưới dạng RemoteConn,
+nên logic của MatchServer (challenge/accept/move/quit) chạy nguyên vẹn.
+Giao thức coordinator: JSON theo dòng, mỗi message có trường 'op'.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import itertools
+import threading
+import multiprocessing
+
+from framing import FrameDecoder
+from matchmaking import MatchQueue
+from timer_wheel import TimerWheel
+from server_core import (ENGINE, ERROR, ThreadConn, clients, clients_lock,
+                         server_log, send_json)
+import server_match
+from server_match import MatchServer, matches, matches_lock, player_match, rating_reply
+
+COORD_PATH = '/tmp/rps_cluster.sock'
+WORKERS = os.cpu_count() or 2
+# Đường nội bộ giữa worker và coordinator không được phép bị ngắt vì đầy hàng đợi
+LINK_LIMITS = {'maxsize': 1 << 20, 'max_bytes': 256 * 1024 * 1024, 'policy': 'disconnect'}
+
+def _send_op(conn, obj):
+    conn.sendall((json.dumps(obj) + '\n').encode('utf-8'))
+
+def _deliver(conn, name, obj):
+    """Gửi message obj cho người chơi name qua worker đang giữ kết nối của họ"""
+    _send_op(conn, {'op': 'deliver', 'name': name, 'data': json.dumps(obj) + '\n'})
+
+def _read_ops(sock, handler):
+    """Đọc các message JSON theo dòng từ sock và gọi handler(msg) cho từng message"""
+    decoder = FrameDecoder(max_frame=64 * 1024 * 1024, bufsize=65536)
+    while decoder.recv_from(sock):
+        for frame in decoder.frames():
+            handler(json.loads(frame))
+
+# --- COORDINATOR (tiến trình cha) ---
+class Coordinator:
+    def __init__(self, path=COORD_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.workers = {}       # worker_id -> ThreadConn
+        self.players = {}       # name -> worker_id
+        self.match_owner = {}   # match_id -> worker_id
+        self.match_players = {} # match_id -> [p1, p2]
+        self.scheduler = TimerWheel(tick=0.1)
+        self.matchmaking = MatchQueue(self.scheduler, self._queue_paired)
+
+    def start(self):
+        self.scheduler.start()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        self._sock.listen()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            sock, _ = self._sock.accept()
+            threading.Thread(target=self._worker_link, args=(sock,), daemon=True).start()
+
+    def _worker_link(self, sock):
+        conn = ThreadConn(sock, 'worker', **LINK_LIMITS)
+        state = {'worker': None}
+        try:
+            _read_ops(sock, lambda msg: self._handle(msg, conn, state))
+        except Exception as e:
+            server_log(f'Coordinator: lỗi liên kết worker {state["worker"]}: {e}', level=ERROR)
+        finally:
+            wid = state['worker']
+            with self.lock:
+                self.workers.pop(wid, None)
+                gone = [n for n, w in self.players.items() if w == wid]
+                for n in gone:
+                    del self.players[n]
+                    self.matchmaking.remove(n)
+                ended = []
+                for mid in [m for m, w in self.match_owner.items() if w == wid]:
+                    del self.match_owner[mid]
+                    ended.append({'op': 'match_end', 'match_id': mid, 'players': self.match_players.pop(mid, [])})
+                peers = list(self.workers.values())
+            ops = ended + [{'op': 'leave', 'name': n} for n in gone]
+            for op in ops:
+                for peer in peers:
+                    try:
+                        _send_op(peer, op)
+                    except Exception:
+                        pass
+            conn.close()
+
+    def _others(self, wid):
+        return [c for w, c in self.workers.items() if w != wid]
+
+    def _handle(self, msg, conn, state):
+        op = msg.get('op')
+        wid = state['worker']
+        if op == 'hello':
+            state['worker'] = msg['worker']
+            with self.lock:
+                self.workers[msg['worker']] = conn
+                snapshot = dict(self.players)
+                live = {mid: players for mid, players in self.match_players.items()}
+            _send_op(conn, {'op': 'snapshot', 'players': snapshot, 'matches': live})
+            return
+        if op == 'rating_record':
+            server_match.ratings.record(msg['a'], msg['b'], msg['score'])
+            return
+        if op == 'rating_query':
+            _send_op(conn, {'op': 'rating_reply', 'req': msg['req'], 'reply': rating_reply(server_match.ratings, msg['msg'])})
+            return
+        if op == 'join':
+            name = msg['name']
+            peers = []
+            with self.lock:
+                owner = self.players.get(name)
+                if owner is None:
+                    self.players[name] = wid
+                    peers = self._others(wid)
+            if owner is not None and owner != wid:
+                # hai worker cùng nhận một tên gần như đồng thời -> người đăng ký sau bị từ chối
+                _send_op(conn, {'op': 'kick', 'name': name, 'worker': owner})
+                return
+            for peer in peers:
+                _send_op(peer, {'op': 'join', 'name': name, 'worker': wid})
+            return
+        if op == 'queue':
+            # worker đã kiểm tra người gửi và already_in_match
+            player = msg['player']
+            if player in self.matchmaking:
+                _deliver(conn, player, {'type': 'error', 'note': 'already_queued'})
+                return
+            rating = round(server_match.ratings.rating(player))
+            # báo 'queued' trước: match_start (nếu ghép ngay trong add()) đi sau trên cùng đường
+            _deliver(conn, player, {'type': 'queued', 'rating': rating, 'waiting': len(self.matchmaking) + 1})
+            self.matchmaking.add(player, rating)
+            return
+        if op == 'dequeue':
+            player = msg['player']
+            if self.matchmaking.remove(player):
+                _deliver(conn, player, {'type': 'dequeued'})
+            else:
+                _deliver(conn, player, {'type': 'error', 'note': 'not_queued'})
+            return
+        if op == 'requeue':
+            # worker không mở được trận đã ghép (người kia vừa vào trận khác): đưa người còn lại về hàng chờ
+            player = msg['player']
+            with self.lock:
+                online = player in self.players
+            if online:
+                self.matchmaking.add(player, round(server_match.ratings.rating(player)))
+            return
+        if op == 'leave':
+            name = msg['name']
+            with self.lock:
+                if self.players.get(name) != wid:
+                    return
+                del self.players[name]
+                peers = self._others(wid)
+            self.matchmaking.remove(name)
+            for peer in peers:
+                _send_op(peer, msg)
+            return
+        if op == 'deliver':
+            with self.lock:
+                target = self.workers.get(self.players.get(msg['name']))
+            if target is not None:
+                _send_op(target, msg)
+            return
+        if op == 'match_start':
+            for p in msg['players']:
+                self.matchmaking.remove(p)
+            with self.lock:
+                self.match_owner[msg['match_id']] = wid
+                self.match_players[msg['match_id']] = msg['players']
+                peers = self._others(wid)
+            for peer in peers:
+                _send_op(peer, msg)
+            return
+        if op == 'match_end':
+            with self.lock:
+                self.match_owner.pop(msg['match_id'], None)
+                self.match_players.pop(msg['match_id'], None)
+                peers = self._others(wid)
+            for peer in peers:
+                _send_op(peer, msg)
+            return
+        if op == 'forward':
+            mid = msg.get('match_id')
+            if mid is None and msg['msg'].get('action') in ('quit', 'expire'):
+                self.matchmaking.remove(msg['msg'].get('player'))
+            with self.lock:
+                if mid is None:
+                    targets = self._others(wid)
+                else:
+                    owner = self.workers.get(self.match_owner.get(mid))
+                    targets = [owner] if owner is not None else []
+            if mid is not None and not targets:
+                _deliver(conn, msg['msg'].get('player'), {'type': 'error', 'note': 'match_not_found'})
+                return
+            for target in targets:
+                _send_op(target, msg)
+            return
+
+    def _queue_paired(self, p1, p2):
+        # gọi từ MatchQueue (luồng liên kết worker hoặc luồng bánh xe hẹn giờ): worker của p1 mở trận
+        with self.lock:
+            owner = self.workers.get(self.players.get(p1)) or self.workers.get(self.players.get(p2))
+        if owner is not None:
+            _send_op(owner, {'op': 'start_match', 'p1': p1, 'p2': p2})
+
+# --- PROXY CHO NGƯỜI CHƠI Ở WORKER KHÁC ---
+class RemoteConn:
+    """Đại diện cho người chơi kết nối ở worker khác: sendall() chuyển dữ liệu qua coordinator.
+    Luôn dùng JSON; worker đích sẽ mã hóa lại theo giao thức thật của kết nối."""
+    proto = 'json'
+
+    def __init__(self, link, name, worker):
+        self.link = link
+        self.name = name
+        self.worker = worker
+
+    def sendall(self, data):
+        _send_op(self.link, {'op': 'deliver', 'name': self.name, 'data': data.decode('utf-8')})
+
+    def close(self):
+        pass
+
+# --- WORKER ---
+class ShardMatchServer(MatchServer):
+    """MatchServer chạy trong một worker của cluster."""
+    reuse_port = True
+
+    def __init__(self, worker_id, host='0.0.0.0', port=9999, engine=ENGINE, coord_path=COORD_PATH, workers=WORKERS):
+        super().__init__(host, port, engine)
+        self.worker_id = worker_id
+        # handle trận không trùng giữa các worker: worker i cấp i+1, i+1+workers, i+1+2*workers, ...
+        self._handles = itertools.count(worker_id + 1, workers)
+        # bảng rating và hàng chờ ghép trận thuộc coordinator
+        self._rating_reqs = {}  # mã yêu cầu -> kết nối chờ trả lời leaderboard / rank
+        self._req_ids = itertools.count(1)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(coord_path)
+        self.link = ThreadConn(sock, 'coordinator', **LINK_LIMITS)
+        _send_op(self.link, {'op': 'hello', 'worker': worker_id})
+        threading.Thread(target=self._link_loop, args=(sock,), daemon=True).start()
+
+    def _link_loop(self, sock):
+        try:
+            _read_ops(sock, self._handle_op)
+        except Exception as e:
+            server_log(f'Worker {self.worker_id}: mất kết nối coordinator: {e}', level=ERROR)
+
+    def _add_remote(self, name, worker):
+        with clients_lock:
+            if name not in clients:
+                clients[name] = {'conn': RemoteConn(self.link, name, worker), 'addr': ('worker', worker), 'queue': None}
+
+    def _remove_remote(self, name):
+        with clients_lock:
+            if name in clients and isinstance(clients[name]['conn'], RemoteConn):
+                del clients[name]
+
+    def _mirror_match(self, mid, players, live):
+        """Ghi / xóa người chơi của trận ở worker khác trong player_match của worker này"""
+        with matches_lock:
+            for p in players:
+                if live:
+                    player_match.setdefault(p, mid)
+                elif player_match.get(p) == mid:
+                    del player_match[p]
+
+    def _handle_op(self, msg):
+        op = msg.get('op')
+        if op == 'snapshot':
+            for name, worker in msg['players'].items():
+                self._add_remote(name, worker)
+            for mid, players in msg.get('matches', {}).items():
+                self._mirror_match(int(mid), players, True)
+        elif op == 'rating_reply':
+            conn = self._rating_reqs.pop(msg['req'], None)
+            if conn is not None:
+                send_json(conn, msg['reply'])
+        elif op == 'start_match':
+            # cặp do hàng chờ của coordinator ghép; người chơi ở worker khác dùng RemoteConn
+            p1, p2 = msg['p1'], msg['p2']
+            if self.start_match(p1, p2) is None:
+                with matches_lock:
+                    back = [p for p in (p1, p2) if p not in player_match]
+                for p in back:
+                    _send_op(self.link, {'op': 'requeue', 'player': p})
+        elif op == 'match_start':
+            self._mirror_match(msg['match_id'], msg['players'], True)
+        elif op == 'match_end':
+            self._mirror_match(msg['match_id'], msg['players'], False)
+        elif op == 'join':
+            self._add_remote(msg['name'], msg['worker'])
+        elif op == 'leave':
+            # người chơi ở worker khác rời đi: trận của họ có thể nằm ở worker này
+            self.forfeit_player(msg['name'])
+            self._remove_remote(msg['name'])
+        elif op == 'kick':
+            name = msg['name']
+            with clients_lock:
+                info = clients.get(name)
+                if not info or isinstance(info['conn'], RemoteConn):
+                    return
+                # tên thuộc về người chơi ở worker khác: thay kết nối cục bộ bằng proxy
+                clients[name] = {'conn': RemoteConn(self.link, name, msg['worker']), 'addr': ('worker', msg['worker']), 'queue': None}
+            send_json(info['conn'], {'type': 'error', 'note': 'name_taken'})
+            info['conn'].close()
+        elif op == 'deliver':
+            with clients_lock:
+                info = clients.get(msg['name'])
+            if not info or isinstance(info['conn'], RemoteConn):
+                return
+            for line in msg['data'].splitlines():
+                send_json(info['conn'], json.loads(line))
+        elif op == 'forward' and msg['msg'].get('action') == 'expire':
+            self.forfeit_player(msg['msg'].get('player'))
+        elif op == 'forward':
+            inner = msg['msg']
+            with clients_lock:
+                info = clients.get(inner.get('player'))
+            if info:
+                MatchServer.process_message(self, inner, info['conn'], info['addr'])
+
+    def process_message(self, msg, conn, addr):
+        action = msg.get('action')
+        if action == 'move':
+            mid = msg.get('match_id')
+            with matches_lock:
+                local = mid in matches
+            if mid and not local:
+                _send_op(self.link, {'op': 'forward', 'match_id': mid, 'msg': msg})
+                return
+        elif action == 'quit':
+            _send_op(self.link, {'op': 'forward', 'match_id': None, 'msg': msg})
+        super().process_message(msg, conn, addr)
+
+    def on_register(self, name):
+        _send_op(self.link, {'op': 'join', 'name': name})
+        super().on_register(name)
+
+    def on_disconnect(self, name):
+        with clients_lock:
+            info = clients.get(name)
+        if info and isinstance(info['conn'], RemoteConn):
+            # kết nối bị kick vì trùng tên: tên (và trận) thuộc về worker khác
+            return
+        _send_op(self.link, {'op': 'leave', 'name': name})
+        super().on_disconnect(name)
+
+    def on_expire(self, name):
+        # trận của người chơi có thể nằm ở worker khác: các worker khác xử thua như 'quit'
+        _send_op(self.link, {'op': 'forward', 'match_id': None, 'msg': {'action': 'expire', 'player': name}})
+        super().on_expire(name)
+
+    def record_rating(self, p1, p2, score_p1):
+        _send_op(self.link, {'op': 'rating_record', 'a': p1, 'b': p2, 'score': score_p1})
+
+    def ratings_request(self, msg, conn):
+        req = next(self._req_ids)
+        self._rating_reqs[req] = conn
+        _send_op(self.link, {'op': 'rating_query', 'req': req, 'msg': msg})
+
+    def queue_request(self, player, conn):
+        _send_op(self.link, {'op': 'queue', 'player': player})
+
+    def dequeue_request(self, player, conn):
+        _send_op(self.link, {'op': 'dequeue', 'player': player})
+
+    def on_match_start(self, match_id, p1, p2):
+        _send_op(self.link, {'op': 'match_start', 'match_id': match_id, 'players': [p1, p2]})
+
+    def on_match_end(self, match_id, p1, p2):
+        _send_op(self.link, {'op': 'match_end', 'match_id': match_id, 'players': [p1, p2]})
+
+def _worker_main(worker_id, host, port, engine, coord_path, workers):
+    # bản bảng rating kế thừa từ tiến trình cha không được ghi: coordinator là nơi duy nhất ghi file
+    server_match.ratings.close()
+    server = ShardMatchServer(worker_id, host, port, engine, coord_path, workers)
+    server.start()
+    # Worker không có GUI: kênh gui_queue có giới hạn nên không cần ai đọc
+    while True:
+        time.sleep(3600)
+
+def run_cluster(workers=WORKERS, host='0.0.0.0', port=9999, engine=ENGINE, coord_path=COORD_PATH):
+    """Khởi động coordinator và `workers` tiến trình ShardMatchServer. Trả về danh sách Process."""
+    coordinator = Coordinator(coord_path)
+    coordinator.start()
+    procs = []
+    for wid in range(workers):
+        p = multiprocessing.Process(target=_worker_main, args=(wid, host, port, engine, coord_path, workers), daemon=True)
+        p.start()
+        procs.append(p)
+    server_log(f'Cluster khởi động {workers} worker tại {host}:{port} (engine={engine})')
+    return coordinator, procs
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else WORKERS
+    coordinator, procs = run_cluster(n, engine=sys.argv[2] if len(sys.argv) > 2 else ENGINE)
+    print(f'Cluster {n} worker đang chạy. Nhấn Ctrl+C để dừng.')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
@@ -10,66 +10,422 @@ import json
 import time
 from datetime import datetime
 import os
-import queue
+import asyncio
+import collections
+from framing import FrameDecoder, LengthPrefixedDecoder, FrameTooLarge, MAX_FRAME_SIZE
+import binproto
+from timer_wheel import TimerWheel
+from log_writer import LogWriter
+from gui_channel import GuiChannel
 
 HOST = '0.0.0.0'
 PORT = 9999
 BUFFER_SIZE = 4096
 LOGFILE = 'server_log.txt'
+# Ghi log theo lô ở luồng nền: chu kỳ flush (giây), ngưỡng kích thước lô,
+# xoay file khi vượt LOG_ROTATE_BYTES hoặc sau LOG_ROTATE_INTERVAL giây (0 = tắt), giữ LOG_BACKUPS bản cũ
+LOG_FLUSH_INTERVAL = 0.2
+LOG_BATCH_BYTES = 64 * 1024
+LOG_ROTATE_BYTES = 10 * 1024 * 1024
+LOG_ROTATE_INTERVAL = 0
+LOG_BACKUPS = 5
+# Mức log: chỉ ghi các dòng có mức >= LOG_LEVEL (DEBUG = từng nước đi / từng round, tắt mặc định)
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+LOG_LEVEL = INFO
+# Ghi thêm log dạng JSON lines (mỗi dòng một object: ts, level, msg, match_id, player, action, latency_us...)
+# vào file này với mức >= LOG_JSON_LEVEL; None = tắt
+LOG_JSON_FILE = None
+LOG_JSON_LEVEL = DEBUG
+
+# Chế độ xử lý kết nối: 'thread' (mỗi client một luồng) hoặc 'asyncio' (một event loop cho tất cả)
+ENGINE = 'thread'
+LISTEN_BACKLOG = 1024
+# Giới hạn hàng đợi gửi cho mỗi kết nối (số message và tổng số byte chờ gửi)
+OUTBOUND_QUEUE_SIZE = 1024
+OUTBOUND_MAX_BYTES = 256 * 1024
+# Khi client đọc chậm làm đầy hàng đợi: 'disconnect' (ngắt kết nối) hoặc 'drop_oldest' (bỏ message cũ nhất)
+OVERFLOW_POLICY = 'disconnect'
+
+# Heartbeat: gửi ping khi client im lặng quá HEARTBEAT_INTERVAL giây,
+# ngắt kết nối khi im lặng quá IDLE_TIMEOUT giây (0 = tắt)
+HEARTBEAT_INTERVAL = 15
+IDLE_TIMEOUT = 45
 
 # Danh sách client đang online
 clients_lock = threading.Lock()
-clients = {}  # name -> {'conn': socket, 'addr': addr, 'queue': Queue}
+clients = {}  # name -> {'conn': OutboundConn, 'addr': addr, 'queue': hàng đợi gửi của conn}
+
+# Bộ hẹn giờ dùng chung cho toàn server (một luồng cho mọi timer)
+scheduler = TimerWheel(tick=0.1)
 
-# Hàng đợi chia sẻ cho GUI (phần 3)
-gui_queue = queue.Queue()
+# Kênh sự kiện cho GUI (phần 3): có giới hạn, gộp ảnh chụp trạng thái, không bao giờ chặn luồng mạng
+gui_queue = GuiChannel()
 
 # Tạo thư mục lưu lịch sử nếu chưa có
 os.makedirs('history', exist_ok=True)
 
 # --- GHI LOG ---
-log_lock = threading.Lock()
+log_writer = LogWriter(LOGFILE, LOG_FLUSH_INTERVAL, LOG_BATCH_BYTES, LOG_ROTATE_BYTES, LOG_ROTATE_INTERVAL, LOG_BACKUPS)
+
+_json_writer = None
+_json_lock = threading.Lock()
+
+def _json_sink():
+    global _json_writer
+    with _json_lock:
+        if _json_writer is None or _json_writer.path != LOG_JSON_FILE:
+            if _json_writer:
+                _json_writer.close()
+            _json_writer = LogWriter(LOG_JSON_FILE, LOG_FLUSH_INTERVAL, LOG_BATCH_BYTES, LOG_ROTATE_BYTES, LOG_ROTATE_INTERVAL, LOG_BACKUPS)
+        return _json_writer
+
+def log_enabled(level):
+    """Có sink nào nhận mức log này không (dùng để bỏ qua việc tính toán chỉ phục vụ log)"""
+    return level >= LOG_LEVEL or (LOG_JSON_FILE is not None and level >= LOG_JSON_LEVEL)
 
-def server_log(msg):
-    """Ghi log ra file và gửi thông báo đến GUI"""
+def server_log(msg, *args, level=INFO, **fields):
+    """Ghi log (qua bộ ghi theo lô, không chặn) và gửi thông báo đến GUI.
+    msg % args chỉ được tính khi mức log đang bật; fields (match_id, player, action, latency_us...)
+    chỉ đi vào file JSON lines."""
+    text = level >= LOG_LEVEL
+    structured = LOG_JSON_FILE is not None and level >= LOG_JSON_LEVEL
+    if not (text or structured):
+        return
+    if args:
+        msg = msg % args
+    if structured:
+        rec = {'ts': round(time.time(), 6), 'level': LEVEL_NAMES.get(level, level), 'msg': msg}
+        rec.update(fields)
+        _json_sink().write(json.dumps(rec, ensure_ascii=False, default=str) + '\n')
+    if not text:
+        return
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    line = f'[{timestamp}] {msg}'
-    with log_lock:
-        with open(LOGFILE, 'a', encoding='utf-8') as f:
-            f.write(line + '\n')
+    if level == INFO:
+        line = f'[{timestamp}] {msg}'
+    else:
+        line = f'[{timestamp}] {LEVEL_NAMES.get(level, level)}: {msg}'
+    log_writer.write(line + '\n')
     try:
         gui_queue.put(('log', line))
     except Exception:
         pass
 
+def close_logs():
+    """Ghi nốt các dòng log còn trong bộ đệm"""
+    log_writer.close()
+    with _json_lock:
+        if _json_writer:
+            _json_writer.close()
+
 # --- HÀM GỬI JSON ---
+def encode_message(conn, obj):
+    """Mã hóa message theo giao thức kết nối đã chọn lúc đăng ký ('json' hoặc 'bin')"""
+    if getattr(conn, 'proto', 'json') == 'bin':
+        return binproto.encode_message(obj)
+    return (json.dumps(obj) + '\n').encode('utf-8')
+
 def send_json(conn, obj):
+    """Mã hóa và xếp message vào hàng đợi gửi của conn (không chặn với OutboundConn)"""
     try:
-        data = json.dumps(obj) + '\n'
-        conn.sendall(data.encode('utf-8'))
+        conn.sendall(encode_message(conn, obj))
     except Exception as e:
-        server_log(f'Lỗi gửi dữ liệu đến client: {e}')
+        server_log(f'Lỗi gửi dữ liệu đến client: {e}', level=ERROR)
+
+def broadcast_json(conns, obj):
+    """Gửi cùng một message đến nhiều kết nối: chỉ mã hóa một lần cho mỗi giao thức,
+    rồi xếp cùng một buffer bytes vào hàng đợi của từng kết nối."""
+    encoded = {}
+    for conn in conns:
+        try:
+            proto = getattr(conn, 'proto', 'json')
+            data = encoded.get(proto)
+            if data is None:
+                data = encoded[proto] = encode_message(conn, obj)
+            conn.sendall(data)
+        except Exception as e:
+            server_log(f'Lỗi gửi dữ liệu đến client: {e}', level=ERROR)
+
+# --- HÀNG ĐỢI GỬI CHO MỖI KẾT NỐI ---
+# Bộ đếm toàn server cho các lần chính sách backpressure được kích hoạt
+outbound_stats_lock = threading.Lock()
+outbound_stats = collections.Counter()  # 'dropped_messages', 'dropped_bytes', 'evicted_clients'
+
+def _count(key, n=1):
+    with outbound_stats_lock:
+        outbound_stats[key] += n
+
+class OutboundConn:
+    """Kết nối có hàng đợi gửi giới hạn. sendall() chỉ xếp dữ liệu vào hàng đợi và
+    trả về ngay, writer riêng của kết nối mới thực sự ghi ra socket.
+    Khi hàng đợi vượt giới hạn (số message hoặc số byte), áp dụng policy:
+    'drop_oldest' bỏ message cũ nhất, 'disconnect' ngắt client đọc chậm."""
+    def __init__(self, addr, maxsize=OUTBOUND_QUEUE_SIZE, max_bytes=OUTBOUND_MAX_BYTES, policy=OVERFLOW_POLICY):
+        if policy not in ('disconnect', 'drop_oldest'):
+            raise ValueError(f'policy không hợp lệ: {policy}')
+        self.addr = addr
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.proto = 'json'
+        self.decoder = None
+        self.name = None
+        self.last_seen = time.monotonic()
+        self.timer = None
+        self.queue = collections.deque()
+        self.queued_bytes = 0
+        self.dropped = 0
+        self.evicted = False
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def _over_limit(self, size):
+        return len(self.queue) >= self.maxsize or self.queued_bytes + size > self.max_bytes
+
+    def sendall(self, data):
+        size = len(data)
+        with self._lock:
+            if self.closed:
+                raise ConnectionError('kết nối đã đóng')
+            evict = False
+            if self._over_limit(size):
+                if self.policy == 'drop_oldest':
+                    n = nbytes = 0
+                    if size > self.max_bytes:
+                        # bản thân message lớn hơn giới hạn -> chỉ bỏ message này, giữ nguyên hàng đợi
+                        n = 1
+                        nbytes = size
+                        size = 0
+                    else:
+                        while self.queue and self._over_limit(size):
+                            old = self.queue.popleft()
+                            self.queued_bytes -= len(old)
+                            n += 1
+                            nbytes += len(old)
+                    self.dropped += n
+                    _count('dropped_messages', n)
+                    _count('dropped_bytes', nbytes)
+                else:
+                    evict = True
+                    self.evicted = True
+                    self.closed = True
+                    self.queue.clear()
+                    self.queued_bytes = 0
+            if not evict and size:
+                self.queue.append(data)
+                self.queued_bytes += size
+        if evict:
+            _count('evicted_clients')
+            server_log(f'Ngắt kết nối {self.addr}: client đọc quá chậm (hàng đợi gửi đầy)', level=WARNING)
+            self._abort()
+            raise OverflowError(f'hàng đợi gửi đến {self.addr} đã đầy')
+        self._wakeup()
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+        self._wakeup()
+
+    def stats(self):
+        with self._lock:
+            return {'queued': len(self.queue), 'queued_bytes': self.queued_bytes,
+                    'dropped': self.dropped, 'evicted': self.evicted}
+
+    def _take_all(self):
+        with self._lock:
+            items = list(self.queue)
+            self.queue.clear()
+            self.queued_bytes = 0
+            return items, self.closed
+
+    def _wakeup(self):
+        raise NotImplementedError
+
+    def _abort(self):
+        """Đóng ngay kết nối, kể cả khi writer đang bị chặn bởi client không đọc"""
+        raise NotImplementedError
+
+def get_outbound_stats():
+    """Trả về bộ đếm toàn server và trạng thái hàng đợi gửi của từng client"""
+    with clients_lock:
+        conns = {name: info['conn'] for name, info in clients.items()}
+    per_client = {name: c.stats() for name, c in conns.items() if isinstance(c, OutboundConn)}
+    with outbound_stats_lock:
+        totals = dict(outbound_stats)
+    return {'totals': totals, 'clients': per_client}
+
+# Số buffer tối đa cho một lần sendmsg (giới hạn IOV_MAX của hệ điều hành)
+IOV_MAX = 1024
+
+def _send_vectored(sock, items):
+    """Gửi nhiều buffer bằng ít lời gọi sendmsg nhất có thể (ghi vector), xử lý cả khi gửi thiếu."""
+    if not hasattr(sock, 'sendmsg'):
+        sock.sendall(b''.join(items))
+        return
+    views = [memoryview(b) for b in items]
+    while views:
+        batch = views[:IOV_MAX]
+        sent = sock.sendmsg(batch)
+        i = 0
+        while i < len(batch) and sent >= len(batch[i]):
+            sent -= len(batch[i])
+            i += 1
+        views = views[i:]
+        if sent:
+            views[0] = views[0][sent:]
+
+class ThreadConn(OutboundConn):
+    """Engine 'thread': một luồng writer cho mỗi kết nối."""
+    def __init__(self, sock, addr, **limits):
+        super().__init__(addr, **limits)
+        self.sock = sock
+        self._ready = threading.Event()
+        threading.Thread(target=self._writer_loop, daemon=True).start()
+
+    def _wakeup(self):
+        self._ready.set()
+
+    def _abort(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except:
+            pass
+        self._ready.set()
+
+    def _writer_loop(self):
+        try:
+            while True:
+                self._ready.wait()
+                self._ready.clear()
+                items, closed = self._take_all()
+                if items:
+                    _send_vectored(self.sock, items)
+                if closed:
+                    break
+        except Exception as e:
+            server_log(f'Lỗi gửi dữ liệu đến {self.addr}: {e}', level=ERROR)
+        with self._lock:
+            self.closed = True
+            self.queue.clear()
+            self.queued_bytes = 0
+        try:
+            # shutdown để luồng đọc (đang recv) thoát ra
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except:
+            pass
+        try:
+            self.sock.close()
+        except:
+            pass
+
+class AsyncConn(OutboundConn):
+    """Engine 'asyncio': một coroutine writer cho mỗi kết nối, chạy trên event loop.
+    sendall() có thể gọi từ bất kỳ luồng nào."""
+    def __init__(self, writer, loop, **limits):
+        super().__init__(writer.get_extra_info('peername'), **limits)
+        self.writer = writer
+        self.loop = loop
+        self._loop_thread = threading.get_ident()
+        self._ready = asyncio.Event()
+        self.task = loop.create_task(self._writer_loop())
+
+    def _wakeup(self):
+        if threading.get_ident() == self._loop_thread:
+            self._ready.set()
+        else:
+            self.loop.call_soon_threadsafe(self._ready.set)
+
+    def _abort(self):
+        if threading.get_ident() == self._loop_thread:
+            self.writer.transport.abort()
+            self._ready.set()
+        else:
+            self.loop.call_soon_threadsafe(self.writer.transport.abort)
+            self.loop.call_soon_threadsafe(self._ready.set)
+
+    async def _writer_loop(self):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                items, closed = self._take_all()
+                self.writer.writelines(items)
+                await self.writer.drain()
+                if closed:
+                    break
+        except Exception as e:
+            server_log(f'Lỗi gửi dữ liệu đến {self.addr}: {e}', level=ERROR)
+        with self._lock:
+            self.closed = True
+            self.queue.clear()
+            self.queued_bytes = 0
+        self.writer.close()
 
 # --- LỚP SERVER CORE ---
 class ServerCore:
     """Lớp server cơ bản, quản lý socket và kết nối client."""
-    def __init__(self, host=HOST, port=PORT):
+    # Giới hạn hàng đợi gửi áp dụng cho mỗi kết nối mới (có thể ghi đè theo lớp/đối tượng)
+    outbound_max_messages = OUTBOUND_QUEUE_SIZE
+    outbound_max_bytes = OUTBOUND_MAX_BYTES
+    overflow_policy = OVERFLOW_POLICY
+    # Độ dài tối đa của một message nhận từ client
+    max_frame_size = MAX_FRAME_SIZE
+    # Bật SO_REUSEPORT để nhiều tiến trình cùng lắng nghe một cổng (xem server_cluster.py)
+    reuse_port = False
+    heartbeat_interval = HEARTBEAT_INTERVAL
+    idle_timeout = IDLE_TIMEOUT
+
+    def __init__(self, host=HOST, port=PORT, engine=ENGINE):
+        if engine not in ('thread', 'asyncio'):
+            raise ValueError(f'engine không hợp lệ: {engine}')
         self.host = host
         self.port = port
+        self.engine = engine
         self.stop_event = threading.Event()
         self._server_sock = None
 
     def start(self):
-        t = threading.Thread(target=self._serve_forever, daemon=True)
+        target = self._serve_asyncio if self.engine == 'asyncio' else self._serve_forever
+        t = threading.Thread(target=target, daemon=True)
         t.start()
-        server_log(f'ServerCore khởi động tại {self.host}:{self.port}')
+        scheduler.start()
+        server_log(f'ServerCore khởi động tại {self.host}:{self.port} (engine={self.engine})')
         return t
 
+    def _outbound_limits(self):
+        return {'maxsize': self.outbound_max_messages, 'max_bytes': self.outbound_max_bytes,
+                'policy': self.overflow_policy}
+
+    # --- HEARTBEAT: một timer trong bánh xe cho mỗi kết nối, không có luồng riêng ---
+    def _watch(self, conn):
+        if self.heartbeat_interval:
+            conn.timer = scheduler.schedule(self.heartbeat_interval, self._heartbeat, conn)
+
+    def _heartbeat(self, conn):
+        if conn.closed:
+            return
+        idle = time.monotonic() - conn.last_seen
+        if self.idle_timeout and idle >= self.idle_timeout:
+            server_log(f'{conn.name or conn.addr} không phản hồi sau {idle:.0f}s -> ngắt kết nối', level=WARNING)
+            if conn.name:
+                self.on_expire(conn.name)
+            conn._abort()
+            conn.close()
+            return
+        if idle >= self.heartbeat_interval:
+            send_json(conn, {'type': 'ping'})
+        self._watch(conn)
+
     def _serve_forever(self):
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self.reuse_port:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             s.bind((self.host, self.port))
-            s.listen()
+            s.listen(LISTEN_BACKLOG)
             self._server_sock = s
             s.settimeout(1.0)
             while not self.stop_event.is_set():
@@ -80,8 +436,46 @@ class ServerCore:
                 except socket.timeout:
                     continue
                 except Exception as e:
-                    server_log(f'Lỗi khi chấp nhận kết nối: {e}')
+                    server_log(f'Lỗi khi chấp nhận kết nối: {e}', level=ERROR)
+                    break
+
+    # --- ENGINE ASYNCIO: một event loop phục vụ mọi kết nối ---
+    def _serve_asyncio(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self._async_main())
+        except Exception as e:
+            server_log(f'Lỗi event loop: {e}', level=ERROR)
+        finally:
+            loop.close()
+
+    async def _async_main(self):
+        server = await asyncio.start_server(self._async_client, self.host, self.port,
+                                            reuse_address=True, reuse_port=self.reuse_port or None,
+                                            backlog=LISTEN_BACKLOG)
+        async with server:
+            while not self.stop_event.is_set():
+                await asyncio.sleep(0.5)
+
+    async def _async_client(self, reader, writer):
+        conn = AsyncConn(writer, asyncio.get_running_loop(), **self._outbound_limits())
+        addr = conn.addr
+        server_log(f'Kết nối mới từ {addr}')
+        conn.decoder = FrameDecoder(self.max_frame_size)
+        self._watch(conn)
+        name = None
+        try:
+            while True:
+                data = await reader.read(BUFFER_SIZE)
+                if not data:
                     break
+                conn.decoder.feed(data)
+                name = self._handle_frames(conn, addr, name)
+        except Exception as e:
+            server_log(f'Lỗi kết nối {addr}: {e}', level=ERROR)
+        finally:
+            self._cleanup(name, conn, addr)
 
     def stop(self):
         self.stop_event.set()
@@ -91,58 +485,106 @@ class ServerCore:
         except:
             pass
         server_log('ServerCore đã dừng')
+        close_logs()
 
-    def _client_worker(self, conn, addr):
+    def _client_worker(self, sock, addr):
+        conn = ThreadConn(sock, addr, **self._outbound_limits())
+        conn.decoder = FrameDecoder(self.max_frame_size, BUFFER_SIZE)
+        self._watch(conn)
         name = None
-        buff = ''
         try:
-            while True:
-                data = conn.recv(BUFFER_SIZE)
-                if not data:
-                    break
-                buff += data.decode('utf-8')
-                while '\n' in buff:
-                    line, buff = buff.split('\n', 1)
-                    if not line.strip():
-                        continue
-                    try:
-                        msg = json.loads(line.strip())
-                    except Exception:
-                        server_log(f'JSON không hợp lệ từ {addr}: {line}')
-                        continue
-
-                    # --- Đăng ký tên người chơi ---
-                    if msg.get('action') == 'register' and msg.get('name'):
-                        name = msg.get('name')
-                        with clients_lock:
-                            if name in clients:
-                                send_json(conn, {'type': 'error', 'note': 'name_taken'})
-                                server_log(f'Đăng ký thất bại: tên đã tồn tại ({name}) từ {addr}')
-                                continue
-                            clients[name] = {'conn': conn, 'addr': addr, 'queue': queue.Queue()}
-                        send_json(conn, {'type': 'ok', 'note': 'registered'})
-                        server_log(f'{name} đã đăng ký từ {addr}')
-                        self.on_register(name)
-
-                    # --- Gọi xử lý riêng ---
-                    self.process_message(msg, conn, addr)
+            while conn.decoder.recv_from(sock):
+                name = self._handle_frames(conn, addr, name)
         except Exception as e:
-            server_log(f'Lỗi kết nối {addr}: {e}')
+            server_log(f'Lỗi kết nối {addr}: {e}', level=ERROR)
         finally:
-            if name:
-                server_log(f'Client {name} đã ngắt kết nối')
-                self.on_disconnect(name)
-                with clients_lock:
-                    if name in clients:
-                        try:
-                            clients[name]['conn'].close()
-                        except:
-                            pass
-                        del clients[name]
+            self._cleanup(name, conn, addr)
+
+    def _handle_frames(self, conn, addr, name):
+        """Xử lý mọi frame hoàn chỉnh đang có trong decoder của conn. Trả về tên người chơi hiện tại."""
+        conn.last_seen = time.monotonic()
+        while True:
+            decoder = conn.decoder
+            frames = decoder.frames()
             try:
-                conn.close()
-            except:
-                pass
+                for frame in frames:
+                    name = self._handle_frame(frame, decoder.binary, conn, addr, name)
+                    if conn.decoder is not decoder:
+                        break
+            except FrameTooLarge as e:
+                send_json(conn, {'type': 'error', 'note': 'frame_too_large', 'max': decoder.max_frame})
+                server_log(f'Bỏ qua frame quá dài từ {addr}: {e}', level=WARNING)
+                continue
+            finally:
+                frames.close()
+            if conn.decoder is decoder:
+                return name
+            # Đã đổi giao thức giữa chừng: phần dữ liệu còn lại thuộc về decoder mới
+            conn.decoder.feed(decoder.buf)
+
+    def _handle_frame(self, frame, binary, conn, addr, name):
+        """Giải mã một frame (JSON theo dòng hoặc nhị phân) rồi xử lý. Trả về tên người chơi hiện tại."""
+        try:
+            if binary:
+                msg = binproto.decode_message(frame, name)
+            else:
+                if not frame.strip():
+                    return name
+                msg = json.loads(frame.strip())
+        except Exception:
+            server_log(f'Message không hợp lệ từ {addr}: {frame}', level=WARNING)
+            return name
+        return self._handle_message(msg, conn, addr, name)
+
+    def _handle_message(self, msg, conn, addr, name):
+        """Xử lý một message đã giải mã (dùng chung cho cả hai engine). Trả về tên người chơi hiện tại."""
+        # --- Heartbeat ---
+        if msg.get('action') == 'pong':
+            return name
+        if msg.get('action') == 'ping':
+            send_json(conn, {'type': 'pong'})
+            return name
+
+        # --- Client yêu cầu giao thức nhị phân: client đọc nhị phân ngay từ trả lời của frame register,
+        # nhưng vẫn gửi register bằng JSON cho tới khi đăng ký thành công ---
+        want_bin = msg.get('action') == 'register' and msg.get('proto') == 'bin'
+        if want_bin:
+            conn.proto = 'bin'
+
+        # --- Đăng ký tên người chơi ---
+        if msg.get('action') == 'register' and msg.get('name'):
+            new_name = msg.get('name')
+            with clients_lock:
+                if new_name in clients:
+                    send_json(conn, {'type': 'error', 'note': 'name_taken'})
+                    server_log(f'Đăng ký thất bại: tên đã tồn tại ({new_name}) từ {addr}')
+                    return name
+                clients[new_name] = {'conn': conn, 'addr': addr, 'queue': conn.queue}
+            name = conn.name = new_name
+            # chỉ đọc frame nhị phân sau khi đăng ký thành công (áp dụng ngay sau frame này)
+            if want_bin and not isinstance(conn.decoder, LengthPrefixedDecoder):
+                conn.decoder = LengthPrefixedDecoder(self.max_frame_size, BUFFER_SIZE)
+            send_json(conn, {'type': 'ok', 'note': 'registered'})
+            server_log(f'{name} đã đăng ký từ {addr}')
+            self.on_register(name)
+
+        # --- Gọi xử lý riêng ---
+        self.process_message(msg, conn, addr)
+        return name
+
+    def _cleanup(self, name, conn, addr):
+        if conn.timer:
+            conn.timer.cancel()
+        if name:
+            server_log(f'Client {name} đã ngắt kết nối')
+            self.on_disconnect(name)
+            with clients_lock:
+                if name in clients and clients[name]['conn'] is conn:
+                    del clients[name]
+        try:
+            conn.close()
+        except:
+            pass
 
     # --- Các hàm có thể ghi đè ---
     def process_message(self, msg, conn, addr):
@@ -165,8 +607,13 @@ class ServerCore:
         except Exception:
             pass
 
+    def on_expire(self, name):
+        """Gọi khi client không phản hồi heartbeat, ngay trước khi kết nối bị đóng"""
+        pass
+
 if __name__ == '__main__':
-    core = ServerCore()
+    import sys
+    core = ServerCore(engine=sys.argv[1] if len(sys.argv) > 1 else ENGINE)
     core.start()
     print('ServerCore đang chạy. Nhấn Ctrl+C để dừng.')
     try:
@@ -7,8 +7,64 @@ Tích hợp với server_core và server_match để nhận thông tin cập nh
 import tkinter as tk
 from tkinter import ttk, scrolledtext
 import threading
-import queue
+import time
+import collections
 from server_match import MatchServer, gui_queue
+from matchmaking import SortedBuckets
+from log_view import LogView
+
+# Đọc kênh sự kiện trên luồng Tk mỗi UPDATE_INTERVAL_MS ms, tối đa MAX_EVENTS_PER_TICK sự kiện mỗi lần
+UPDATE_INTERVAL_MS = 50
+MAX_EVENTS_PER_TICK = 500
+# Số dòng log giữ lại trong khung log
+LOG_VIEW_LINES = 5000
+# Trận đã kết thúc còn hiện thêm FINISHED_TTL giây rồi mới bị bỏ khỏi bảng
+FINISHED_TTL = 10
+# Bảng trận chỉ tạo MATCH_ROWS_VISIBLE dòng Treeview và cuộn ảo qua toàn bộ danh sách trận
+MATCH_ROWS_VISIBLE = 10
+MATCH_COLUMNS = ('id', 'p1', 'p2', 'state')
+EMPTY_ROW = ('', '', '', '')
+
+# --- MÔ HÌNH BẢNG TRẬN ---
+class MatchTableModel:
+    """Các trận theo match_id: cập nhật theo khóa, thứ tự theo match_id (SortedBuckets) để lấy
+    một cửa sổ dòng bất kỳ trong O(log n); trận kết thúc được bỏ sau ttl giây."""
+    def __init__(self, ttl=FINISHED_TTL):
+        self.ttl = ttl
+        self.rows = {}                      # match_id -> (tên trận, p1, p2, trạng thái)
+        self.order = SortedBuckets()        # các match_id theo thứ tự tăng
+        self._expiry = collections.deque()  # (hạn, match_id) của trận đã kết thúc, theo thứ tự hạn
+        self.version = 0                    # tăng mỗi khi có dòng thay đổi
+
+    def __len__(self):
+        return len(self.rows)
+
+    def upsert(self, mid, name, p1, p2, state):
+        row = (name, p1, p2, state)
+        old = self.rows.get(mid)
+        if old == row:
+            return
+        if old is None:
+            self.order.add(mid)
+        self.rows[mid] = row
+        if state == 'Finished':
+            self._expiry.append((time.monotonic() + self.ttl, mid))
+        self.version += 1
+
+    def expire(self, now=None):
+        now = time.monotonic() if now is None else now
+        q = self._expiry
+        while q and q[0][0] <= now:
+            mid = q.popleft()[1]
+            row = self.rows.get(mid)
+            if row and row[3] == 'Finished':
+                del self.rows[mid]
+                self.order.remove(mid)
+                self.version += 1
+
+    def window(self, start, count):
+        """Các dòng ở vị trí start..start+count-1"""
+        return [self.rows[mid] for mid in self.order.islice(start, start + count)]
 
 class ServerGUI:
     def __init__(self, root):
@@ -32,19 +88,38 @@ class ServerGUI:
         frame_matches = ttk.LabelFrame(main_frame, text='Trận đang diễn ra')
         frame_matches.place(x=310, y=10, width=570, height=250)
 
-        self.tree_matches = ttk.Treeview(frame_matches, columns=('id', 'p1', 'p2', 'state'), show='headings')
+        self.scroll_matches_bar = ttk.Scrollbar(frame_matches, orient='vertical', command=self.scroll_matches)
+        self.scroll_matches_bar.pack(side='right', fill='y', pady=5)
+        self.tree_matches = ttk.Treeview(frame_matches, columns=MATCH_COLUMNS, show='headings', height=MATCH_ROWS_VISIBLE)
         self.tree_matches.heading('id', text='ID trận')
         self.tree_matches.heading('p1', text='Người chơi 1')
         self.tree_matches.heading('p2', text='Người chơi 2')
         self.tree_matches.heading('state', text='Trạng thái')
         self.tree_matches.pack(fill='both', expand=True, padx=5, pady=5)
+        self.tree_matches.bind('<MouseWheel>', self._on_matches_wheel)
+        self.tree_matches.bind('<Button-4>', self._on_matches_wheel)
+        self.tree_matches.bind('<Button-5>', self._on_matches_wheel)
+        # Cuộn ảo: một số dòng cố định, nội dung lấy từ mô hình theo vị trí cuộn
+        self.match_model = MatchTableModel()
+        self.match_items = [self.tree_matches.insert('', 'end', values=EMPTY_ROW) for _ in range(MATCH_ROWS_VISIBLE)]
+        self.match_shown = [EMPTY_ROW] * MATCH_ROWS_VISIBLE
+        self.match_top = 0
+        self.match_drawn = -1
 
         # --- KHU VỰC LOG ---
         frame_log = ttk.LabelFrame(main_frame, text='Nhật ký Server')
         frame_log.place(x=10, y=270, width=870, height=320)
 
+        frame_filter = ttk.Frame(frame_log)
+        frame_filter.pack(fill='x', padx=5, pady=(5, 0))
+        ttk.Label(frame_filter, text='Lọc:').pack(side='left')
+        self.log_filter = tk.StringVar()
+        ttk.Entry(frame_filter, textvariable=self.log_filter).pack(side='left', fill='x', expand=True, padx=5)
+        self.log_filter.trace_add('write', lambda *args: self.log_view.set_filter(self.log_filter.get()))
+
         self.text_log = scrolledtext.ScrolledText(frame_log, font=('Consolas', 11), wrap='word')
         self.text_log.pack(fill='both', expand=True, padx=5, pady=5)
+        self.log_view = LogView(self.text_log, LOG_VIEW_LINES)
 
         # --- NÚT DỪNG SERVER ---
         self.btn_stop = ttk.Button(main_frame, text='Dừng Server', command=self.stop_server)
@@ -53,28 +128,38 @@ class ServerGUI:
         self.server = None
         self.running = True
 
-        # Tạo luồng đọc dữ liệu từ hàng đợi
-        self.update_thread = threading.Thread(target=self.update_loop, daemon=True)
-        self.update_thread.start()
+        # Widget Tk chỉ được cập nhật trên luồng Tk: đọc hàng đợi theo chu kỳ bằng root.after
+        self.root.after(UPDATE_INTERVAL_MS, self.update_loop)
 
     def log(self, msg):
-        self.text_log.insert('end', msg + '\n')
-        self.text_log.see('end')
+        self.log_lines([msg])
+
+    def log_lines(self, lines):
+        # một lần insert cho cả lô, widget được cắt bớt theo LOG_VIEW_LINES
+        self.log_view.append(*lines)
 
     def update_loop(self):
-        while self.running:
-            try:
-                item = gui_queue.get(timeout=0.5)
-                if not item:
-                    continue
-                if item[0] == 'log':
-                    self.log(item[1])
-                elif item[0] == 'players':
-                    self.update_players(item[1])
-                elif item[0] == 'matches':
-                    self.update_matches(item[1])
-            except queue.Empty:
-                continue
+        if not self.running:
+            return
+        lines = []
+        players = None
+        rows = []
+        for kind, data in gui_queue.drain(MAX_EVENTS_PER_TICK):
+            if kind == 'log':
+                lines.append(data)
+            elif kind == 'players':
+                players = data
+            elif kind == 'matches':
+                rows.extend(data)
+        # mỗi lượt vẽ lại mỗi khu vực nhiều nhất một lần
+        if lines:
+            self.log_lines(lines)
+        if players is not None:
+            self.update_players(players)
+        if rows:
+            self.update_matches(rows)
+        self.redraw_matches()
+        self.root.after(UPDATE_INTERVAL_MS, self.update_loop)
 
     def update_players(self, players):
         self.list_players.delete(0, 'end')
@@ -82,10 +167,48 @@ class ServerGUI:
             self.list_players.insert('end', p)
 
     def update_matches(self, match_list):
-        for i in self.tree_matches.get_children():
-            self.tree_matches.delete(i)
-        for mid, p1, p2, st in match_list:
-            self.tree_matches.insert('', 'end', values=(mid, p1, p2, st))
+        for mid, name, p1, p2, st in match_list:
+            self.match_model.upsert(mid, name, p1, p2, st)
+
+    def redraw_matches(self, force=False):
+        """Vẽ lại cửa sổ đang hiện của bảng trận, chỉ sửa các ô thay đổi"""
+        model = self.match_model
+        model.expire()
+        if not force and model.version == self.match_drawn:
+            return
+        self.match_drawn = model.version
+        n = len(self.match_items)
+        total = len(model)
+        self.match_top = max(0, min(self.match_top, total - n))
+        window = model.window(self.match_top, n)
+        for i, iid in enumerate(self.match_items):
+            values = window[i] if i < len(window) else EMPTY_ROW
+            shown = self.match_shown[i]
+            if values == shown:
+                continue
+            for col, old, new in zip(MATCH_COLUMNS, shown, values):
+                if old != new:
+                    self.tree_matches.set(iid, col, new)
+            self.match_shown[i] = values
+        if total > n:
+            self.scroll_matches_bar.set(self.match_top / total, (self.match_top + n) / total)
+        else:
+            self.scroll_matches_bar.set(0, 1)
+
+    def scroll_matches(self, *args):
+        # lệnh từ thanh cuộn: ('moveto', tỉ lệ) hoặc ('scroll', số bước, 'units' | 'pages')
+        n = len(self.match_items)
+        if args[0] == 'moveto':
+            top = int(float(args[1]) * len(self.match_model))
+        else:
+            top = self.match_top + int(args[1]) * (n if args[2] == 'pages' else 1)
+        self.match_top = max(0, min(top, len(self.match_model) - n))
+        self.redraw_matches(force=True)
+
+    def _on_matches_wheel(self, event):
+        up = event.num == 4 or getattr(event, 'delta', 0) > 0
+        self.scroll_matches('scroll', -3 if up else 3, 'units')
+        return 'break'
 
     def start_server(self):
         self.server = MatchServer()
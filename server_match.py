@@ -3,52 +3,158 @@ Phần 2: rps_server_part2_match_logic.py
 Chức năng: Kế thừa từ phần 1, thêm logic ghép cặp, xử lý chơi game (thách đấu, chấp nhận, ra chiêu, thoát trận), tính kết quả best-of-3, và lưu lịch sử trận đấu.
 """
 
-from rps_server_part1_core import ServerCore, send_json, clients, clients_lock, gui_queue, server_log
+from server_core import (ServerCore, ENGINE, send_json, broadcast_json, clients, clients_lock, gui_queue,
+                         server_log, log_enabled, scheduler, DEBUG, ERROR)
 import threading
+import itertools
 import time
 import os
-from datetime import datetime
+import random
+from match_archive import MatchArchive, ARCHIVE_SIZE, ARCHIVE_MAX_AGE
+from match_history import format_history
+from rps_rules import MOVES, MOVE_CODES, DRAW, A_WINS, resolve
+from matchmaking import MatchQueue
+from ratings import RatingTable
+from log_writer import AppendWriter
 
-# Danh sách trận đấu đang diễn ra
+# Danh sách trận đấu đang diễn ra (trận kết thúc được chuyển sang `archive`)
+# Thứ tự khóa (luôn lấy theo chiều này để tránh deadlock):
+#     khóa riêng của trận m.lock  ->  matches_lock  ->  clients_lock
+# - matches_lock chỉ giữ khi tra cứu / thêm / xóa trong `matches` và `player_match`, không gửi dữ liệu.
+# - Mọi thay đổi trạng thái của một trận (chiêu, điểm, round, finished) giữ m.lock,
+#   nên các trận khác nhau chạy song song với nhau.
+# - clients_lock chỉ giữ trong lúc lấy kết nối ra khỏi `clients` (xem _send_to/_conns_of).
 matches_lock = threading.Lock()
-matches = {}  # match_id -> thông tin trận
+matches = {}  # handle (số nguyên) -> Match
+player_match = {}  # tên người chơi -> handle của trận đang chơi (cùng khóa matches_lock)
+
+# Kho các trận đã kết thúc: giữ có giới hạn, tùy chọn ghi ra file
+ARCHIVE_SPILL_FILE = None  # ví dụ 'history/matches_archive.jsonl'
+archive = MatchArchive(ARCHIVE_SIZE, ARCHIVE_MAX_AGE, ARCHIVE_SPILL_FILE)
+
+# Hạn chót cho mỗi round (giây, 0 = không giới hạn) và cách xử lý khi hết giờ:
+# 'forfeit' (người chưa ra chiêu thua trận) hoặc 'random' (ra chiêu ngẫu nhiên thay)
+MOVE_TIMEOUT = 30
+TIMEOUT_POLICY = 'forfeit'
 
 HISTORY_DIR = 'history'
 os.makedirs(HISTORY_DIR, exist_ok=True)
+# ghi lịch sử theo lô trên luồng nền: kết thúc trận không chờ đĩa (không chặn event loop của asyncio)
+history_writer = AppendWriter()
+
+# Rating Elo, cập nhật khi trận kết thúc và lưu nối thêm vào file
+RATINGS_FILE = os.path.join(HISTORY_DIR, 'ratings.tsv')
+ratings = RatingTable(RATINGS_FILE)
 
 # --- HÀM XỬ LÝ KẾT QUẢ MỖI ROUND ---
 def decide_round(move1, move2):
-    order = { 'rock': 0, 'paper': 1, 'scissors': 2 }
-    if move1 == move2:
-        return 'draw'
-    a = order.get(move1)
-    b = order.get(move2)
+    a = MOVE_CODES.get(move1)
+    b = MOVE_CODES.get(move2)
     if a is None or b is None:
         return 'draw'
-    if (a - b) % 3 == 1:
-        return 'p1'
-    else:
-        return 'p2'
+    return ('draw', 'p1', 'p2')[resolve(a, b)]
 
 # --- GHI LỊCH SỬ TRẬN ---
 def append_history(player, opponent, result, score_str):
     fname = os.path.join(HISTORY_DIR, f'history_{player}.txt')
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
-    line = f'[{timestamp}] vs {opponent} — {result} ({score_str})\n'
-    try:
-        with open(fname, 'a', encoding='utf-8') as f:
-            f.write(line)
-    except Exception as e:
-        server_log(f'Lỗi ghi lịch sử cho {player}: {e}')
+    history_writer.write(fname, format_history(opponent, result, score_str))
+
+# --- TRA CỨU TRẬN ĐÃ KẾT THÚC ---
+def lookup_match(match_id):
+    """Trả về bản ghi của trận đã kết thúc gần đây (hoặc None)"""
+    rec = archive.get(match_id)
+    return dict(rec, finished=True) if rec else None
+
+# --- BẢNG XẾP HẠNG / HẠNG (dùng chung cho MatchServer và coordinator của cluster) ---
+def rating_reply(table, msg):
+    """Trả lời 'leaderboard' (top K, hoặc quanh một mức rating với 'near') hoặc 'rank' từ RatingTable"""
+    if msg.get('action') == 'leaderboard':
+        k = int(msg.get('k', 10))
+        near = msg.get('near')
+        rows = table.near(float(near), k) if near is not None else table.top(k)
+        return {'type': 'leaderboard', 'rows': rows, 'total': len(table), 'version': table.version}
+    player = msg.get('name') or msg.get('player')
+    info = table.rank(player)
+    rank, rating, games = info if info else (None, table.rating(player), 0)
+    return {'type': 'rank', 'player': player, 'rank': rank, 'rating': round(rating),
+            'games': games, 'total': len(table)}
+
+# --- GỬI CHO NGƯỜI CHƠI (chỉ giữ clients_lock khi tra cứu kết nối) ---
+def _send_to(player, obj):
+    with clients_lock:
+        info = clients.get(player)
+    if info:
+        send_json(info['conn'], obj)
+
+def _conns_of(*players):
+    with clients_lock:
+        return [clients[p]['conn'] for p in players if p in clients]
 
-# --- TẠO MÃ TRẬN ---
+# --- TẠO TÊN TRẬN (chỉ để hiển thị / ghi lịch sử, không dùng làm khóa) ---
 def mk_match_id(p1, p2):
     return f'{p1}__vs__{p2}__{int(time.time())}'
 
+# --- BẢN GHI MỘT TRẬN ---
+class Match:
+    """Trận đang diễn ra, khóa trong `matches` bằng handle số nguyên (tăng dần, không trùng).
+    Chiêu lưu bằng mã nhỏ (chỉ số trong MOVES), None = chưa ra chiêu."""
+    __slots__ = ('handle', 'name', 'p1', 'p2', 'score1', 'score2', 'round',
+                 'move1', 'move2', 'finished', 'deadline', 'lock')
+
+    def __init__(self, handle, p1, p2):
+        self.handle = handle
+        self.name = mk_match_id(p1, p2)
+        self.p1 = p1
+        self.p2 = p2
+        self.score1 = 0
+        self.score2 = 0
+        self.round = 1
+        self.move1 = None
+        self.move2 = None
+        self.finished = False
+        self.deadline = None
+        self.lock = threading.Lock()
+
+    def score(self):
+        return f'{self.score1}-{self.score2}'
+
+    def score_of(self, player):
+        return self.score1 if player == self.p1 else self.score2
+
+    def other(self, player):
+        return self.p2 if player == self.p1 else self.p1
+
+    def set_move(self, player, code):
+        """Ghi chiêu của player, trả về False nếu player không thuộc trận này"""
+        if player == self.p1:
+            self.move1 = code
+        elif player == self.p2:
+            self.move2 = code
+        else:
+            return False
+        return True
+
+    def missing(self):
+        return [p for p, mv in ((self.p1, self.move1), (self.p2, self.move2)) if mv is None]
+
+    def record(self):
+        """Bản ghi gọn để lưu vào archive khi trận kết thúc"""
+        return {'name': self.name, 'p1': self.p1, 'p2': self.p2,
+                'scores': {self.p1: self.score1, self.p2: self.score2}, 'round': self.round}
+
 # --- LỚP MATCH SERVER ---
 class MatchServer(ServerCore):
-    def __init__(self, host='0.0.0.0', port=9999):
-        super().__init__(host, port)
+    move_timeout = MOVE_TIMEOUT
+    timeout_policy = TIMEOUT_POLICY
+
+    def __init__(self, host='0.0.0.0', port=9999, engine=ENGINE):
+        super().__init__(host, port, engine)
+        self._handles = itertools.count(1)
+        self.matchmaking = MatchQueue(scheduler, self._queue_paired)
+
+    def stop(self):
+        super().stop()
+        history_writer.close()   # ghi nốt lịch sử còn trong bộ đệm
 
     def process_message(self, msg, conn, addr):
         action = msg.get('action')
@@ -73,104 +179,108 @@ class MatchServer(ServerCore):
                     if fr not in clients or to not in clients:
                         send_json(conn, {'type': 'error', 'note': 'one_player_offline'})
                         return
-                mid = mk_match_id(to, fr)
-                match = {
-                    'p1': to,
-                    'p2': fr,
-                    'scores': {to: 0, fr: 0},
-                    'round': 1,
-                    'moves': {},
-                    'finished': False
-                }
+                if self.start_match(to, fr) is None:
+                    send_json(conn, {'type': 'error', 'note': 'already_in_match'})
+                return
+
+            # --- VÀO / RỜI HÀNG CHỜ GHÉP TRẬN TỰ ĐỘNG ---
+            if action == 'queue':
+                player = msg.get('player')
+                # chỉ cho chính người chơi đã đăng ký trên kết nối này vào hàng chờ
+                if not self._is_sender(player, conn):
+                    send_json(conn, {'type': 'error', 'note': 'not_registered'})
+                    return
                 with matches_lock:
-                    matches[mid] = match
-                with clients_lock:
-                    send_json(clients[to]['conn'], {'type': 'match_start', 'opponent': fr, 'match_id': mid})
-                    send_json(clients[fr]['conn'], {'type': 'match_start', 'opponent': to, 'match_id': mid})
-                server_log(f'Trận {mid} bắt đầu giữa {to} và {fr}')
-                gui_queue.put(('matches', [(mid, match['p1'], match['p2'], f'R1 0-0')]))
+                    busy = player in player_match
+                if busy:
+                    send_json(conn, {'type': 'error', 'note': 'already_in_match'})
+                    return
+                self.queue_request(player, conn)
+                return
+
+            if action == 'dequeue':
+                player = msg.get('player')
+                if self._is_sender(player, conn):
+                    self.dequeue_request(player, conn)
+                else:
+                    send_json(conn, {'type': 'error', 'note': 'not_queued'})
                 return
 
             # --- NGƯỜI CHƠI RA CHIÊU ---
             if action == 'move':
+                t0 = time.perf_counter()
                 player = msg.get('player')
                 mv = msg.get('move')
                 match_id = msg.get('match_id')
                 if not match_id:
                     send_json(conn, {'type': 'error', 'note': 'missing match_id'})
                     return
+                code = MOVE_CODES.get(mv)
+                if code is None:
+                    send_json(conn, {'type': 'error', 'note': 'invalid_move'})
+                    return
                 with matches_lock:
-                    if match_id not in matches:
-                        send_json(conn, {'type': 'error', 'note': 'match_not_found'})
-                        return
-                    m = matches[match_id]
-                    if m.get('finished'):
+                    m = matches.get(match_id)
+                if m is None:
+                    note = 'match_finished' if match_id in archive else 'match_not_found'
+                    send_json(conn, {'type': 'error', 'note': note})
+                    return
+                with m.lock:
+                    if m.finished:
                         send_json(conn, {'type': 'error', 'note': 'match_finished'})
                         return
-                    m['moves'][player] = mv
-                    server_log(f'{player} ra chiêu {mv} (round {m["round"]})')
-                    p1 = m['p1']
-                    p2 = m['p2']
+                    if not m.set_move(player, code):
+                        send_json(conn, {'type': 'error', 'note': 'not_in_match'})
+                        return
+                    round_no = m.round
                     # Nếu cả 2 đã ra chiêu -> tính kết quả
-                    if p1 in m['moves'] and p2 in m['moves']:
-                        res = decide_round(m['moves'][p1], m['moves'][p2])
-                        if res == 'draw':
-                            with clients_lock:
-                                for p in (p1, p2):
-                                    if p in clients:
-                                        send_json(clients[p]['conn'], {'type': 'round_result', 'you': 'draw', 'score': f"{m['scores'][p1]}-{m['scores'][p2]}", 'match_id': match_id})
-                            server_log(f'Trận {match_id}: hòa round {m["round"]}')
-                        else:
-                            winner = p1 if res == 'p1' else p2
-                            loser = p2 if winner == p1 else p1
-                            m['scores'][winner] += 1
-                            with clients_lock:
-                                if winner in clients:
-                                    send_json(clients[winner]['conn'], {'type': 'round_result', 'you': 'win', 'score': f"{m['scores'][p1]}-{m['scores'][p2]}", 'match_id': match_id})
-                                if loser in clients:
-                                    send_json(clients[loser]['conn'], {'type': 'round_result', 'you': 'lose', 'score': f"{m['scores'][p1]}-{m['scores'][p2]}", 'match_id': match_id})
-                            server_log(f'Trận {match_id}: người thắng round này là {winner}')
-
-                        m['moves'] = {}
-                        m['round'] += 1
-
-                        # Kiểm tra thắng chung cuộc
-                        for pl in (p1, p2):
-                            if m['scores'][pl] >= 2:
-                                m['finished'] = True
-                                winner = pl
-                                loser = p1 if pl == p2 else p2
-                                with clients_lock:
-                                    if winner in clients:
-                                        send_json(clients[winner]['conn'], {'type': 'match_end', 'result': 'win', 'score': f"{m['scores'][p1]}-{m['scores'][p2]}", 'match_id': match_id})
-                                    if loser in clients:
-                                        send_json(clients[loser]['conn'], {'type': 'match_end', 'result': 'lose', 'score': f"{m['scores'][p1]}-{m['scores'][p2]}", 'match_id': match_id})
-                                server_log(f'Trận {match_id} kết thúc. Người thắng: {winner}')
-                                append_history(winner, loser, 'Win', f"{m['scores'][winner]}-{m['scores'][loser]}")
-                                append_history(loser, winner, 'Lose', f"{m['scores'][loser]}-{m['scores'][winner]}")
-                                gui_queue.put(('matches', [(match_id, p1, p2, 'Finished')]))
-                                break
-                        else:
-                            gui_queue.put(('matches', [(match_id, p1, p2, f'R{m["round"]} {m["scores"][p1]}-{m["scores"][p2]}')]))
+                    if m.move1 is not None and m.move2 is not None:
+                        self._resolve_round(m)
+                if log_enabled(DEBUG):
+                    server_log('%s ra chiêu %s (round %d)', player, mv, round_no, level=DEBUG,
+                               match_id=match_id, player=player, action='move', move=mv, round=round_no,
+                               latency_us=round((time.perf_counter() - t0) * 1e6))
+                return
+
+            # --- TRA CỨU TRẬN (đang diễn ra hoặc vừa kết thúc) ---
+            if action == 'match_info':
+                match_id = msg.get('match_id')
+                with matches_lock:
+                    m = matches.get(match_id)
+                info = None
+                if m:
+                    with m.lock:
+                        if not m.finished:
+                            info = dict(m.record(), finished=False)
+                if not info:
+                    info = lookup_match(match_id)
+                if not info:
+                    send_json(conn, {'type': 'error', 'note': 'match_not_found'})
+                    return
+                send_json(conn, {'type': 'match_info', 'match_id': match_id, 'match_name': info['name'],
+                                 'p1': info['p1'], 'p2': info['p2'],
+                                 'score': f"{info['scores'][info['p1']]}-{info['scores'][info['p2']]}",
+                                 'round': info['round'], 'finished': info['finished']})
+                return
+
+            # --- BẢNG XẾP HẠNG / HẠNG CỦA MỘT NGƯỜI CHƠI ---
+            if action in ('leaderboard', 'rank'):
+                self.ratings_request(msg, conn)
+                return
+
+            # --- NGƯỜI CHƠI CÓ ĐANG TRONG TRẬN KHÔNG ---
+            if action == 'in_match':
+                player = msg.get('player')
+                with matches_lock:
+                    mid = player_match.get(player)
+                send_json(conn, {'type': 'in_match', 'player': player, 'match_id': mid})
                 return
 
             # --- NGƯỜI CHƠI THOÁT GIỮA CHỪNG ---
             if action == 'quit':
                 player = msg.get('player')
-                with matches_lock:
-                    for mid, m in list(matches.items()):
-                        if m.get('finished'):
-                            continue
-                        if player == m['p1'] or player == m['p2']:
-                            other = m['p2'] if player == m['p1'] else m['p1']
-                            m['finished'] = True
-                            with clients_lock:
-                                if other in clients:
-                                    send_json(clients[other]['conn'], {'type': 'match_end', 'result': 'win', 'reason': 'opponent_left', 'match_id': mid})
-                            server_log(f'{player} thoát -> {other} thắng tự động')
-                            append_history(other, player, 'Win (opponent left)', f"{m['scores'][other]}-{m['scores'][player]}")
-                            append_history(player, other, 'Lose (left)', f"{m['scores'][player]}-{m['scores'][other]}")
-                            gui_queue.put(('matches', [(mid, m['p1'], m['p2'], 'Finished')]))
+                self.matchmaking.remove(player)
+                self.forfeit_player(player)
                 with clients_lock:
                     if player in clients:
                         try:
@@ -183,14 +293,226 @@ class MatchServer(ServerCore):
                 return
 
         except Exception as e:
-            server_log(f'Lỗi trong MatchServer.process_message: {e}')
+            server_log(f'Lỗi trong MatchServer.process_message: {e}', level=ERROR)
             try:
                 send_json(conn, {'type': 'error', 'note': 'server_error'})
             except:
                 pass
 
+    def _is_sender(self, player, conn):
+        """player có phải là tên đã đăng ký bằng chính kết nối conn không"""
+        with clients_lock:
+            info = clients.get(player)
+        return info is not None and info['conn'] is conn
+
+    # --- MỞ TRẬN MỚI (từ 'accept' hoặc từ hàng chờ ghép trận) ---
+    def start_match(self, p1, p2):
+        """Tạo trận giữa p1 và p2 rồi gửi match_start. Trả về Match, hoặc None nếu một trong hai đang trong trận."""
+        m = Match(next(self._handles), p1, p2)
+        mid = m.handle
+        with matches_lock:
+            if p1 in player_match or p2 in player_match:
+                return None
+            matches[mid] = m
+            player_match[p1] = mid
+            player_match[p2] = mid
+            self._arm_deadline(m)
+        self.matchmaking.remove(p1)
+        self.matchmaking.remove(p2)
+        self.on_match_start(mid, p1, p2)
+        _send_to(p1, {'type': 'match_start', 'opponent': p2, 'match_id': mid, 'match_name': m.name})
+        _send_to(p2, {'type': 'match_start', 'opponent': p1, 'match_id': mid, 'match_name': m.name})
+        server_log(f'Trận {m.name} bắt đầu giữa {p1} và {p2}', match_id=mid, action='match_start', p1=p1, p2=p2)
+        gui_queue.put(('matches', [(mid, m.name, m.p1, m.p2, f'R1 0-0')]))
+        return m
+
+    def _queue_paired(self, p1, p2):
+        # gọi từ MatchQueue (luồng xử lý client hoặc luồng bánh xe hẹn giờ)
+        if self.start_match(p1, p2) is None:
+            # một người vừa vào trận bằng cách khác: đưa người còn lại về hàng chờ
+            with matches_lock:
+                back = [p for p in (p1, p2) if p not in player_match]
+            for p in back:
+                self.matchmaking.add(p, self.rating_of(p))
+
+    # --- TÍNH KẾT QUẢ ROUND (gọi khi đang giữ m.lock) ---
+    def _resolve_round(self, m):
+        self._cancel_deadline(m)
+        p1 = m.p1
+        p2 = m.p2
+        mid = m.handle
+        res = resolve(m.move1, m.move2)
+        if res == DRAW:
+            broadcast_json(_conns_of(p1, p2), {'type': 'round_result', 'you': 'draw', 'score': m.score(), 'match_id': mid})
+            server_log('Trận %s: hòa round %d', m.name, m.round, level=DEBUG,
+                       match_id=mid, action='round', round=m.round, result='draw')
+        else:
+            if res == A_WINS:
+                winner, loser = p1, p2
+                m.score1 += 1
+            else:
+                winner, loser = p2, p1
+                m.score2 += 1
+            _send_to(winner, {'type': 'round_result', 'you': 'win', 'score': m.score(), 'match_id': mid})
+            _send_to(loser, {'type': 'round_result', 'you': 'lose', 'score': m.score(), 'match_id': mid})
+            server_log('Trận %s: người thắng round này là %s', m.name, winner, level=DEBUG,
+                       match_id=mid, player=winner, action='round', round=m.round, result='win')
+
+        m.move1 = None
+        m.move2 = None
+        m.round += 1
+
+        # Kiểm tra thắng chung cuộc
+        if m.score1 >= 2 or m.score2 >= 2:
+            winner = p1 if m.score1 >= 2 else p2
+            loser = m.other(winner)
+            m.finished = True
+            _send_to(winner, {'type': 'match_end', 'result': 'win', 'score': m.score(), 'match_id': mid})
+            _send_to(loser, {'type': 'match_end', 'result': 'lose', 'score': m.score(), 'match_id': mid})
+            server_log(f'Trận {m.name} kết thúc. Người thắng: {winner}', match_id=mid, player=winner,
+                       action='match_end', score=m.score())
+            append_history(winner, loser, 'Win', f'{m.score_of(winner)}-{m.score_of(loser)}')
+            append_history(loser, winner, 'Lose', f'{m.score_of(loser)}-{m.score_of(winner)}')
+            self._finish_match(m, winner)
+        else:
+            gui_queue.put(('matches', [(mid, m.name, p1, p2, f'R{m.round} {m.score()}')]))
+            self._arm_deadline(m)
+
+    # --- HẠN CHÓT MỖI ROUND (một bánh xe hẹn giờ dùng chung cho mọi trận) ---
+    def _arm_deadline(self, m):
+        if self.move_timeout:
+            m.deadline = scheduler.schedule(self.move_timeout, self._round_timeout, m, m.round)
+
+    def _cancel_deadline(self, m):
+        t = m.deadline
+        m.deadline = None
+        if t:
+            t.cancel()
+
+    def _round_timeout(self, m, round_no):
+        with m.lock:
+            if m.finished or m.round != round_no:
+                return
+            m.deadline = None
+            missing = m.missing()
+            server_log(f'Trận {m.name}: hết giờ round {round_no}, chưa ra chiêu: {", ".join(missing)}',
+                       match_id=m.handle, action='timeout', round=round_no, missing=missing)
+            if self.timeout_policy == 'random':
+                for p in missing:
+                    m.set_move(p, random.randrange(len(MOVES)))
+                self._resolve_round(m)
+            else:
+                self._timeout_forfeit(m, missing)
+
+    def _timeout_forfeit(self, m, missing):
+        p1 = m.p1
+        p2 = m.p2
+        mid = m.handle
+        m.finished = True
+        score = m.score()
+        if len(missing) == 1:
+            loser = missing[0]
+            winner = m.other(loser)
+            _send_to(winner, {'type': 'match_end', 'result': 'win', 'reason': 'timeout', 'score': score, 'match_id': mid})
+            _send_to(loser, {'type': 'match_end', 'result': 'lose', 'reason': 'timeout', 'score': score, 'match_id': mid})
+            server_log(f'Trận {m.name}: {loser} hết giờ -> {winner} thắng', match_id=mid, player=winner,
+                       action='match_end', score=score, reason='timeout')
+            append_history(winner, loser, 'Win (timeout)', f'{m.score_of(winner)}-{m.score_of(loser)}')
+            append_history(loser, winner, 'Lose (timeout)', f'{m.score_of(loser)}-{m.score_of(winner)}')
+        else:
+            winner = None
+            broadcast_json(_conns_of(p1, p2), {'type': 'match_end', 'result': 'draw', 'reason': 'timeout', 'score': score, 'match_id': mid})
+            server_log(f'Trận {m.name}: cả hai hết giờ -> hủy trận', match_id=mid, action='match_end',
+                       score=score, reason='timeout')
+            append_history(p1, p2, 'Draw (timeout)', score)
+            append_history(p2, p1, 'Draw (timeout)', f'{m.score2}-{m.score1}')
+        self._finish_match(m, winner)
+
+    # --- KẾT THÚC TRẬN: chuyển khỏi bảng trận đang diễn ra sang kho lưu trữ (gọi khi giữ m.lock) ---
+    def _finish_match(self, m, winner=None):
+        """winner=None nghĩa là trận hòa"""
+        m.finished = True
+        self._cancel_deadline(m)
+        mid = m.handle
+        with matches_lock:
+            matches.pop(mid, None)
+            for pl in (m.p1, m.p2):
+                if player_match.get(pl) == mid:
+                    del player_match[pl]
+        self.record_rating(m.p1, m.p2, 0.5 if winner is None else float(winner == m.p1))
+        archive.add(mid, m.record())
+        gui_queue.put(('matches', [(mid, m.name, m.p1, m.p2, 'Finished')]))
+        self.on_match_end(mid, m.p1, m.p2)
+
+    # --- XỬ THUA NGƯỜI CHƠI BỎ TRẬN (thoát, mất kết nối) ---
+    def forfeit_player(self, player):
+        """Kết thúc trận đang diễn ra của player (tra qua player_match), đối thủ thắng tự động"""
+        with matches_lock:
+            m = matches.get(player_match.get(player))
+        if not m:
+            return
+        with m.lock:
+            if m.finished:
+                return
+            other = m.other(player)
+            m.finished = True
+            self._cancel_deadline(m)
+            _send_to(other, {'type': 'match_end', 'result': 'win', 'reason': 'opponent_left', 'match_id': m.handle})
+            server_log(f'{player} thoát -> {other} thắng tự động', match_id=m.handle, player=other,
+                       action='match_end', reason='opponent_left')
+            append_history(other, player, 'Win (opponent left)', f'{m.score_of(other)}-{m.score_of(player)}')
+            append_history(player, other, 'Lose (left)', f'{m.score_of(player)}-{m.score_of(other)}')
+            self._finish_match(m, other)
+
+    def on_expire(self, name):
+        # client không phản hồi heartbeat -> xử lý như khi thoát giữa chừng
+        self.forfeit_player(name)
+
+    def on_disconnect(self, name):
+        # mất kết nối giữa trận -> đối thủ thắng tự động
+        self.matchmaking.remove(name)
+        self.forfeit_player(name)
+        super().on_disconnect(name)
+
+    # --- Các hàm có thể ghi đè ---
+    def rating_of(self, player):
+        """Rating dùng để ghép trận tự động"""
+        return round(ratings.rating(player))
+
+    def record_rating(self, p1, p2, score_p1):
+        """Cập nhật rating sau trận; score_p1 = 1 / 0 / 0.5"""
+        ratings.record(p1, p2, score_p1)
+
+    def ratings_request(self, msg, conn):
+        """Trả lời 'leaderboard' / 'rank'"""
+        send_json(conn, rating_reply(ratings, msg))
+
+    def queue_request(self, player, conn):
+        """Đưa player (đã kiểm tra: đúng người gửi, không trong trận) vào hàng chờ ghép trận"""
+        if player in self.matchmaking:
+            send_json(conn, {'type': 'error', 'note': 'already_queued'})
+            return
+        rating = self.rating_of(player)
+        # báo 'queued' trước: có thể được ghép (match_start) ngay trong add()
+        send_json(conn, {'type': 'queued', 'rating': rating, 'waiting': len(self.matchmaking) + 1})
+        self.matchmaking.add(player, rating)
+
+    def dequeue_request(self, player, conn):
+        """Đưa player (đúng người gửi) ra khỏi hàng chờ ghép trận"""
+        if self.matchmaking.remove(player):
+            send_json(conn, {'type': 'dequeued'})
+        else:
+            send_json(conn, {'type': 'error', 'note': 'not_queued'})
+
+    def on_match_start(self, match_id, p1, p2):
+        pass
+
+    def on_match_end(self, match_id, p1, p2):
+        pass
+
 if __name__ == '__main__':
-    ms = MatchServer()
+    import sys
+    ms = MatchServer(engine=sys.argv[1] if len(sys.argv) > 1 else ENGINE)
     ms.start()
     print('MatchServer đang chạy. Nhấn Ctrl+C để dừng.')
     try:
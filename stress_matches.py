@@ -0,0 +1,133 @@
+"""
+stress_matches.py
+Chức năng: Kiểm tra tải cho MatchServer: mở số trận đồng thời tăng dần (mặc định 100, 1000, 10000)
+rồi cho một số luồng cố định ra chiêu song song (gọi thẳng process_message, kết nối giả không ghi ra socket).
+In ra số chiêu xử lý mỗi giây theo số trận và kiểm tra thông lượng KHÔNG giảm khi số trận tăng
+(ở mức lớn nhất phải đạt ít nhất MIN_RATIO lần mức nhỏ nhất): chi phí mỗi chiêu chỉ phụ thuộc trận
+của nó (khóa riêng từng trận, tra cứu theo handle), không phụ thuộc số trận đang mở.
+Để so sánh, cũng đo lại mức lớn nhất khi mọi chiêu xếp hàng sau một khóa toàn cục.
+
+Giới hạn: với CPython có GIL, thêm luồng KHÔNG làm tăng thông lượng cho việc xử lý chiêu (thuần CPU);
+khóa riêng từng trận chỉ bảo đảm các trận không chờ nhau khi một luồng bị chặn (gửi dữ liệu, I/O),
+nên bài đo này không kỳ vọng tăng tốc theo số luồng.
+
+Cách dùng: python stress_matches.py [số_luồng] [số_trận ...]
+    ví dụ: python stress_matches.py 4 100 1000 10000
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import threading
+
+# log và lịch sử trận của lần chạy thử ghi vào thư mục tạm, không đụng đến dữ liệu thật
+os.chdir(tempfile.mkdtemp(prefix='rps_stress_'))
+
+import server_core
+import server_match
+from server_core import clients, clients_lock
+from server_match import MatchServer, MOVES
+
+THREADS = 4
+MATCH_COUNTS = (100, 1000, 10000)
+MIN_RATIO = 0.7     # thông lượng ở số trận lớn nhất / ở số trận nhỏ nhất
+REPEAT = 3          # đo mỗi mức vài lần, lấy lần tốt nhất (bớt nhiễu)
+
+class NullConn:
+    """Kết nối giả: chỉ đếm số byte server định gửi"""
+    proto = 'json'
+
+    def __init__(self):
+        self.sent = 0
+
+    def sendall(self, data):
+        self.sent += len(data)
+
+    def close(self):
+        pass
+
+def _setup(ms, n, tag):
+    """Đăng ký 2*n người chơi và mở n trận, trả về danh sách (match_id, p1, p2)"""
+    games = []
+    for i in range(n):
+        p1, p2 = f'{tag}a{i}', f'{tag}b{i}'
+        with clients_lock:
+            for p in (p1, p2):
+                clients[p] = {'conn': NullConn(), 'addr': ('stress', 0), 'queue': None}
+        ms.process_message({'action': 'accept', 'from': p2, 'to': p1}, clients[p2]['conn'], ('stress', 0))
+        games.append((server_match.player_match[p1], p1, p2))
+    return games
+
+def _play(process, games, counter):
+    """Ra chiêu lần lượt cho từng trận trong phần được giao đến khi mọi trận kết thúc"""
+    rnd = random.Random()
+    moves = 0
+    live = list(games)
+    while live:
+        still = []
+        for mid, p1, p2 in live:
+            for p in (p1, p2):
+                process({'action': 'move', 'player': p, 'move': rnd.choice(MOVES), 'match_id': mid},
+                        clients[p]['conn'], ('stress', 0))
+                moves += 1
+            if mid in server_match.matches:
+                still.append((mid, p1, p2))
+        live = still
+    counter.append(moves)
+
+def run(n_matches, n_threads, tag, global_lock=False):
+    """Chơi hết n_matches trận đồng thời bằng n_threads luồng; trả về (số chiêu, số giây)"""
+    ms = MatchServer()
+    ms.move_timeout = 0
+    process = ms.process_message
+    if global_lock:
+        # đường so sánh: mọi chiêu xếp hàng sau một khóa chung
+        big_lock = threading.Lock()
+
+        def process(msg, conn, addr):
+            with big_lock:
+                ms.process_message(msg, conn, addr)
+    games = _setup(ms, n_matches, tag)
+    counter = []
+    workers = [threading.Thread(target=_play, args=(process, games[i::n_threads], counter))
+               for i in range(n_threads)]
+    t0 = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    with clients_lock:
+        for _, p1, p2 in games:
+            clients.pop(p1, None)
+            clients.pop(p2, None)
+    assert not server_match.matches, 'còn trận chưa kết thúc'
+    return sum(counter), elapsed
+
+def best_rate(n_matches, n_threads, tag, global_lock=False):
+    rates = []
+    for r in range(REPEAT):
+        moves, elapsed = run(n_matches, n_threads, f'{tag}r{r}_', global_lock)
+        rates.append(moves / elapsed)
+    return max(rates)
+
+if __name__ == '__main__':
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else THREADS
+    counts = sorted(int(x) for x in sys.argv[2:]) or MATCH_COUNTS
+    print(f'{threads} luồng, log tại {os.getcwd()}')
+    print('Lưu ý: CPython có GIL, xử lý chiêu thuần CPU không nhanh hơn khi thêm luồng; '
+          'bài đo chỉ kiểm tra thông lượng không giảm khi số trận đồng thời tăng.')
+    print(f'{"số trận":>8} {"chiêu/giây":>12}')
+    rates = {}
+    for n in counts:
+        rates[n] = best_rate(n, threads, f'm{n}_')
+        print(f'{n:>8} {rates[n]:>12.0f}')
+    lo, hi = counts[0], counts[-1]
+    baseline = best_rate(hi, threads, f'g{hi}_', global_lock=True)
+    print(f'{hi:>8} {baseline:>12.0f}  (khóa toàn cục, để so sánh)')
+    server_core.scheduler.stop()
+    ratio = rates[hi] / rates[lo]
+    print(f'{hi} trận / {lo} trận = {ratio:.2f} (yêu cầu >= {MIN_RATIO})')
+    assert ratio >= MIN_RATIO, f'thông lượng giảm khi số trận tăng: {rates[hi]:.0f} < {MIN_RATIO} x {rates[lo]:.0f}'
@@ -0,0 +1,112 @@
+"""
+timer_wheel.py
+Chức năng: Bánh xe hẹn giờ phân cấp (hierarchical timer wheel), một luồng duy nhất cho mọi timer.
+- schedule() / cancel() đều O(1), dù có hàng chục nghìn timer đang chờ.
+- Mỗi cấp có 2^bits ô; timer ở xa nằm ở cấp cao và được "đổ" (cascade) xuống cấp thấp dần khi gần đến hạn.
+- Callback chạy trên luồng của bánh xe, nên phải ngắn và không được chặn.
+"""
+
+import threading
+import time
+import traceback
+
+class Timer:
+    __slots__ = ('expires', 'callback', 'args', 'cancelled')
+
+    def __init__(self, expires, callback, args):
+        self.expires = expires
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        # hủy lười: timer bị bỏ qua khi đến lượt (không cần tìm trong bánh xe)
+        self.cancelled = True
+
+class TimerWheel:
+    def __init__(self, tick=0.1, bits=8, levels=4):
+        self.tick = tick
+        self.bits = bits
+        self.levels = levels
+        self.mask = (1 << bits) - 1
+        self.max_ticks = (1 << (bits * levels)) - 1
+        self.wheels = [[[] for _ in range(1 << bits)] for _ in range(levels)]
+        self.current = 0          # số tick đã xử lý
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _place(self, t):
+        delta = t.expires - self.current
+        if delta < 0:
+            self.wheels[0][self.current & self.mask].append(t)
+            return
+        if delta > self.max_ticks:
+            t.expires = self.current + self.max_ticks
+            delta = self.max_ticks
+        level = 0
+        while delta >= (1 << (self.bits * (level + 1))):
+            level += 1
+        self.wheels[level][(t.expires >> (self.bits * level)) & self.mask].append(t)
+
+    def schedule(self, delay, callback, *args):
+        """Gọi callback(*args) sau `delay` giây. Trả về Timer (có thể cancel())."""
+        with self._lock:
+            ticks = max(1, int(round(delay / self.tick)))
+            t = Timer(self.current + ticks, callback, args)
+            self._place(t)
+        return t
+
+    def _cascade(self, level, index):
+        slot = self.wheels[level][index]
+        self.wheels[level][index] = []
+        for t in slot:
+            if not t.cancelled:
+                self._place(t)
+
+    def _advance_one(self):
+        """Tiến một tick, trả về danh sách timer đến hạn (gọi khi giữ _lock)"""
+        index = self.current & self.mask
+        if index == 0:
+            level = 1
+            while level < self.levels:
+                j = (self.current >> (self.bits * level)) & self.mask
+                self._cascade(level, j)
+                if j != 0:
+                    break
+                level += 1
+        due = self.wheels[0][index]
+        self.wheels[0][index] = []
+        self.current += 1
+        return due
+
+    def advance(self, now=None):
+        """Xử lý mọi tick đã trôi qua tính đến `now` (time.monotonic())."""
+        target = int(((now if now is not None else time.monotonic()) - self._start) / self.tick)
+        while True:
+            with self._lock:
+                if self.current > target:
+                    return
+                due = self._advance_one()
+            for t in due:
+                if t.cancelled:
+                    continue
+                try:
+                    t.callback(*t.args)
+                except Exception:
+                    traceback.print_exc()
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            self.advance()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
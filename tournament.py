@@ -0,0 +1,290 @@
+"""
+tournament.py
+Chức năng: Chạy giải đấu hàng loạt giữa các bot (vòng tròn hoặc hệ Thụy Sĩ) không cần socket,
+dùng đúng luật của MatchServer: best-of-3, ai thắng 2 round trước thắng trận, hòa thì đấu lại round.
+- Mọi trận của một bảng được biểu diễn bằng mảng (chiến thuật, điểm, chiêu trước của mỗi bên);
+  mỗi bước tiến TẤT CẢ trận đang diễn ra thêm một round, giải bằng rps_rules.resolve_batch().
+- Các bảng độc lập (nhóm cặp đấu) được chia cho nhiều tiến trình (multiprocessing.Pool).
+- Kết quả: bảng xếp hạng, và tùy chọn ghi lịch sử đúng định dạng append_history.
+
+Chiến thuật bot là công thức trên mã chiêu: chiêu = (a*round + b*chiêu_trước_của_đối_thủ + c) % 3,
+hoặc ngẫu nhiên; nhờ vậy mọi bot trong bảng được tính chung một phép toán mảng.
+
+Cách dùng: python tournament.py [roundrobin|swiss] [số_trận_mỗi_cặp] [chiến_thuật ...]
+    ví dụ: python tournament.py roundrobin 10000 random rock cycle copycat beat_last
+"""
+
+import os
+import sys
+import time
+import random
+import multiprocessing
+from collections import defaultdict
+
+import rps_rules
+from rps_rules import A_WINS, B_WINS
+from match_history import format_history
+
+np = rps_rules.np
+
+# (a, b, c, ngẫu nhiên): chiêu = (a*round + b*chiêu_trước_của_đối_thủ + c) % 3; round đầu chiêu_trước = 0
+STRATEGIES = {
+    'random':    (0, 0, 0, 1),
+    'rock':      (0, 0, 0, 0),
+    'paper':     (0, 0, 1, 0),
+    'scissors':  (0, 0, 2, 0),
+    'cycle':     (1, 0, 0, 0),   # lần lượt paper, scissors, rock, ...
+    'copycat':   (0, 1, 0, 0),   # lặp lại chiêu trước của đối thủ
+    'beat_last': (0, 1, 1, 0),   # ra chiêu thắng chiêu trước của đối thủ
+}
+
+WINS_NEEDED = 2
+# Hai bot cố định có thể hòa mãi (rock vs rock): quá số round này thì xử hòa
+MAX_ROUNDS = 50
+WORKERS = os.cpu_count() or 2
+GAMES_PER_PAIR = 1000
+SWISS_ROUNDS = 5
+
+# --- CHƠI MỘT BẢNG: mọi trận cùng tiến từng round ---
+def play_matches(strat_a, strat_b, seed=None, max_rounds=MAX_ROUNDS):
+    """strat_a, strat_b: danh sách tham số chiến thuật (bộ 4 trong STRATEGIES) của từng trận.
+    Trả về (score_a, score_b, rounds) theo từng trận."""
+    if np is not None:
+        return _play_np(strat_a, strat_b, seed, max_rounds)
+    return _play_py(strat_a, strat_b, seed, max_rounds)
+
+def _play_np(strat_a, strat_b, seed, max_rounds):
+    rng = np.random.default_rng(seed)
+    pa = np.asarray(strat_a, dtype=np.int64).reshape(-1, 4)
+    pb = np.asarray(strat_b, dtype=np.int64).reshape(-1, 4)
+    n = len(pa)
+    score_a = np.zeros(n, dtype=np.int8)
+    score_b = np.zeros(n, dtype=np.int8)
+    rounds = np.zeros(n, dtype=np.int16)
+    last_a = np.zeros(n, dtype=np.int64)
+    last_b = np.zeros(n, dtype=np.int64)
+    active = np.arange(n)
+    rnd = 1
+    while active.size and rnd <= max_rounds:
+        moves = []
+        for p, opp_last in ((pa[active], last_b[active]), (pb[active], last_a[active])):
+            mv = (p[:, 0] * rnd + p[:, 1] * opp_last + p[:, 2]) % 3
+            rand = p[:, 3] != 0
+            if rand.any():
+                mv[rand] = rng.integers(0, 3, int(rand.sum()))
+            moves.append(mv)
+        out = rps_rules.resolve_batch(moves[0], moves[1])
+        score_a[active] += out == A_WINS
+        score_b[active] += out == B_WINS
+        last_a[active] = moves[0]
+        last_b[active] = moves[1]
+        rounds[active] = rnd
+        active = active[(score_a[active] < WINS_NEEDED) & (score_b[active] < WINS_NEEDED)]
+        rnd += 1
+    return score_a, score_b, rounds
+
+def _play_py(strat_a, strat_b, seed, max_rounds):
+    rng = random.Random(seed)
+    n = len(strat_a)
+    score_a = [0] * n
+    score_b = [0] * n
+    rounds = [0] * n
+    last_a = [0] * n
+    last_b = [0] * n
+    active = list(range(n))
+    rnd = 1
+    while active and rnd <= max_rounds:
+        moves = []
+        for strat, opp_last in ((strat_a, last_b), (strat_b, last_a)):
+            mv = []
+            for i in active:
+                a, b, c, rand = strat[i]
+                mv.append(rng.randrange(3) if rand else (a * rnd + b * opp_last[i] + c) % 3)
+            moves.append(mv)
+        out = rps_rules.resolve_batch(moves[0], moves[1])
+        still = []
+        for k, i in enumerate(active):
+            if out[k] == A_WINS:
+                score_a[i] += 1
+            elif out[k] == B_WINS:
+                score_b[i] += 1
+            last_a[i] = moves[0][k]
+            last_b[i] = moves[1][k]
+            rounds[i] = rnd
+            if score_a[i] < WINS_NEEDED and score_b[i] < WINS_NEEDED:
+                still.append(i)
+        active = still
+        rnd += 1
+    return score_a, score_b, rounds
+
+def _play_bracket(task):
+    """Chạy trong tiến trình con: task = (các cặp (i, j), chiến thuật của bot, số trận mỗi cặp, seed)"""
+    pairs, strategies, games, seed = task
+    if np is not None:
+        # tham số từng trận lấy từ bảng bot x 4 theo chỉ số, không dựng list/tuple cho từng trận
+        params = np.array([STRATEGIES[s] for s in strategies], dtype=np.int64)
+        p = np.asarray(pairs, dtype=np.int32).reshape(-1, 2)
+        idx_a = np.repeat(p[:, 0], games)
+        idx_b = np.repeat(p[:, 1], games)
+        score_a, score_b, rounds = play_matches(params.take(idx_a, axis=0), params.take(idx_b, axis=0), seed)
+        return idx_a, idx_b, score_a, score_b, rounds
+    idx_a = [i for i, j in pairs for _ in range(games)]
+    idx_b = [j for i, j in pairs for _ in range(games)]
+    score_a, score_b, rounds = play_matches([STRATEGIES[strategies[i]] for i in idx_a],
+                                            [STRATEGIES[strategies[j]] for j in idx_b], seed)
+    return idx_a, idx_b, score_a, score_b, rounds
+
+# --- GIẢI ĐẤU ---
+class Tournament:
+    """Giải đấu giữa các bot; bots là danh sách tên chiến thuật trong STRATEGIES (có thể trùng)."""
+    def __init__(self, bots, games_per_pair=GAMES_PER_PAIR, workers=WORKERS, seed=None):
+        for s in bots:
+            if s not in STRATEGIES:
+                raise ValueError(f'chiến thuật không hợp lệ: {s}')
+        self.strategies = list(bots)
+        seen = defaultdict(int)
+        self.names = []
+        for s in bots:
+            seen[s] += 1
+            self.names.append(s if seen[s] == 1 else f'{s}#{seen[s]}')
+        self.games = games_per_pair
+        self.workers = workers
+        self.seed = seed if seed is not None else random.randrange(1 << 30)
+        self._batches = 0
+        n = len(bots)
+        self.wins = [0] * n           # số trận thắng
+        self.losses = [0] * n
+        self.draws = [0] * n          # trận bị xử hòa vì quá MAX_ROUNDS
+        self.rounds_won = [0] * n
+        self.results = []             # các lô kết quả (idx_a, idx_b, score_a, score_b, rounds)
+
+    def points(self, i):
+        return self.wins[i] + 0.5 * self.draws[i]
+
+    def _run_pairs(self, pairs, pool=None):
+        """Chơi mọi cặp trong `pairs`, chia thành các bảng độc lập cho process pool"""
+        k = max(1, min(self.workers, len(pairs)))
+        tasks = []
+        for b in range(k):
+            chunk = pairs[b::k]
+            if chunk:
+                tasks.append((chunk, self.strategies, self.games, self.seed + self._batches))
+                self._batches += 1
+        results = pool.map(_play_bracket, tasks) if pool is not None and len(tasks) > 1 else map(_play_bracket, tasks)
+        for res in results:
+            self._record(*res)
+            self.results.append(res)
+
+    def _record(self, idx_a, idx_b, score_a, score_b, rounds):
+        n = len(self.names)
+        if np is not None:
+            ia = np.asarray(idx_a)
+            ib = np.asarray(idx_b)
+            sa = np.asarray(score_a)
+            sb = np.asarray(score_b)
+            a_won = sa >= WINS_NEEDED
+            b_won = sb >= WINS_NEEDED
+            drawn = ~(a_won | b_won)
+            for arr, idx, mask in ((self.wins, ia, a_won), (self.wins, ib, b_won),
+                                   (self.losses, ia, b_won), (self.losses, ib, a_won),
+                                   (self.draws, ia, drawn), (self.draws, ib, drawn)):
+                for i, c in enumerate(np.bincount(idx[mask], minlength=n)):
+                    arr[i] += int(c)
+            for idx, sc in ((ia, sa), (ib, sb)):
+                for i, c in enumerate(np.bincount(idx, weights=sc, minlength=n)):
+                    self.rounds_won[i] += int(c)
+            return
+        for a, b, sa, sb in zip(idx_a, idx_b, score_a, score_b):
+            self.rounds_won[a] += sa
+            self.rounds_won[b] += sb
+            if sa >= WINS_NEEDED:
+                self.wins[a] += 1
+                self.losses[b] += 1
+            elif sb >= WINS_NEEDED:
+                self.wins[b] += 1
+                self.losses[a] += 1
+            else:
+                self.draws[a] += 1
+                self.draws[b] += 1
+
+    def round_robin(self):
+        """Mỗi cặp bot đấu với nhau games_per_pair trận"""
+        n = len(self.names)
+        pairs = [(i, j) for i in range(n) for j in range(i + 1, n)]
+        with multiprocessing.Pool(self.workers) as pool:
+            self._run_pairs(pairs, pool)
+        return self.standings()
+
+    def swiss(self, rounds=SWISS_ROUNDS):
+        """Hệ Thụy Sĩ: mỗi vòng ghép các bot gần điểm nhau (tránh gặp lại nếu được),
+        mỗi cặp đấu games_per_pair trận; bot lẻ được miễn đấu và tính thắng các trận đó."""
+        n = len(self.names)
+        met = set()
+        with multiprocessing.Pool(self.workers) as pool:
+            for _ in range(rounds):
+                order = sorted(range(n), key=lambda i: (-self.points(i), i))
+                pairs = []
+                while len(order) > 1:
+                    i = order.pop(0)
+                    j = next((j for j in order if (min(i, j), max(i, j)) not in met), order[0])
+                    order.remove(j)
+                    met.add((min(i, j), max(i, j)))
+                    pairs.append((i, j))
+                if order:
+                    self.wins[order[0]] += self.games
+                self._run_pairs(pairs, pool)
+        return self.standings()
+
+    def standings(self):
+        """Danh sách (hạng, tên, thắng, thua, hòa, điểm, round thắng), sắp theo điểm"""
+        order = sorted(range(len(self.names)), key=lambda i: (-self.points(i), -self.rounds_won[i], self.names[i]))
+        return [(rank, self.names[i], self.wins[i], self.losses[i], self.draws[i], self.points(i), self.rounds_won[i])
+                for rank, i in enumerate(order, 1)]
+
+    def history_lines(self):
+        """Sinh (tên bot, dòng lịch sử) cho từng trận, cùng định dạng append_history"""
+        timestamp = time.strftime('%Y-%m-%d %H:%M')
+        names = self.names
+        for idx_a, idx_b, score_a, score_b, _ in self.results:
+            for a, b, sa, sb in zip(idx_a, idx_b, score_a, score_b):
+                sa = int(sa)
+                sb = int(sb)
+                if sa >= WINS_NEEDED:
+                    ra, rb = 'Win', 'Lose'
+                elif sb >= WINS_NEEDED:
+                    ra, rb = 'Lose', 'Win'
+                else:
+                    ra = rb = 'Draw (round limit)'
+                yield names[a], format_history(names[b], ra, f'{sa}-{sb}', timestamp)
+                yield names[b], format_history(names[a], rb, f'{sb}-{sa}', timestamp)
+
+    def write_history(self, history_dir='history'):
+        """Ghi lịch sử vào history_dir/history_<bot>.txt (mở mỗi file một lần)"""
+        os.makedirs(history_dir, exist_ok=True)
+        files = {}
+        try:
+            for name, line in self.history_lines():
+                f = files.get(name)
+                if f is None:
+                    f = files[name] = open(os.path.join(history_dir, f'history_{name}.txt'), 'a', encoding='utf-8')
+                f.write(line)
+        finally:
+            for f in files.values():
+                f.close()
+
+def print_standings(rows):
+    print(f'{"#":>3} {"bot":<14} {"thắng":>9} {"thua":>9} {"hòa":>7} {"điểm":>11} {"round":>10}')
+    for rank, name, w, l, d, pts, rw in rows:
+        print(f'{rank:>3} {name:<14} {w:>9} {l:>9} {d:>7} {pts:>11.1f} {rw:>10}')
+
+if __name__ == '__main__':
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'roundrobin'
+    games = int(sys.argv[2]) if len(sys.argv) > 2 else GAMES_PER_PAIR
+    bots = sys.argv[3:] or list(STRATEGIES)
+    t = Tournament(bots, games)
+    t0 = time.perf_counter()
+    rows = t.swiss() if mode == 'swiss' else t.round_robin()
+    elapsed = time.perf_counter() - t0
+    total = sum(len(r[0]) for r in t.results)
+    print(f'{mode}: {total} trận trong {elapsed:.2f}s ({"numpy" if np is not None else "python"})')
+    print_standings(rows)